@@ -0,0 +1,170 @@
+"""Adaptive work scheduling to keep stream latency within a budget
+
+``AdaptiveScheduler`` watches smoothed per-stage timings reported by the
+frame pipeline and, about once per ``adjust_interval``, turns one knob:
+
+- inference stride: run emotion inference on every N-th captured frame
+- inference resolution: width the frame is scaled to for face detection
+- stabilization: whether frames are stabilized before streaming
+
+When the capture-to-result (inference) latency is over budget it lowers
+the resolution first, then raises the stride; when the capture-to-encoded
+(frame) latency is over budget it drops stabilization first. With enough
+headroom it spends it on inference rate, then resolution, then
+stabilization, but only when the measured inference time (scaled by
+pixel count for a larger width) predicts the workers can keep up with the
+camera at the new setting. After any degradation the knobs are held for a
+few intervals so the scheduler doesn't oscillate.
+"""
+
+import threading
+import time
+from typing import Dict, Optional, Sequence
+
+# Stages the pipeline reports, in seconds
+STAGES = ("capture_interval", "preprocess", "inference", "encode",
+          "inference_latency", "frame_latency")
+
+
+class AdaptiveScheduler:
+    """Chooses inference stride, resolution and stabilization from measured timings"""
+
+    def __init__(self, latency_budget: float = 0.15,
+                 widths: Sequence[int] = (640, 480, 320),
+                 max_stride: int = 6, stabilize: bool = True, workers: int = 1,
+                 headroom: float = 0.7, adjust_interval: float = 1.0,
+                 hold_intervals: int = 5, smoothing: float = 0.2,
+                 max_inference_rate: Optional[float] = None):
+        self.latency_budget = latency_budget
+        self.widths = tuple(sorted(widths, reverse=True))
+        self.max_stride = max(1, max_stride)
+        self.workers = max(1, workers)
+        self.headroom = headroom
+        self.adjust_interval = adjust_interval
+        self.hold_seconds = hold_intervals * adjust_interval
+        self.smoothing = smoothing
+        self.max_inference_rate = max_inference_rate
+        self._last_inference = 0.0
+
+        self.stride = 1
+        self.stabilize = stabilize
+        self._allow_stabilize = stabilize
+        self._width_index = 0
+        self._timings: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._last_adjust = time.monotonic()
+        self._hold_until = 0.0
+        self.adjustments = 0
+        self.last_decision = "initial"
+
+    @property
+    def inference_width(self) -> Optional[int]:
+        """Width frames are scaled to for face detection (None = unchanged)"""
+        return self.widths[self._width_index] if self.widths else None
+
+    def should_infer(self, frame_id: int) -> bool:
+        """Whether this captured frame goes to the inference stage
+
+        Called from the capture thread only.
+        """
+        if frame_id % self.stride:
+            return False
+        if self.max_inference_rate:
+            now = time.monotonic()
+            if now - self._last_inference < 1.0 / self.max_inference_rate:
+                return False
+            self._last_inference = now
+        return True
+
+    def record(self, stage: str, seconds: float):
+        """Add a timing sample for a pipeline stage and adapt if it's time to"""
+        with self._lock:
+            previous = self._timings.get(stage)
+            self._timings[stage] = (seconds if previous is None
+                                    else previous + self.smoothing * (seconds - previous))
+            now = time.monotonic()
+            if now - self._last_adjust >= self.adjust_interval:
+                self._last_adjust = now
+                self._adjust(now)
+
+    def _adjust(self, now: float):
+        budget = self.latency_budget
+        inference_latency = self._timings.get("inference_latency", 0.0)
+        frame_latency = self._timings.get("frame_latency", 0.0)
+        # Without widths the index stays at 0 and only stride/stabilization move
+        last_width = max(len(self.widths) - 1, 0)
+        width_index = self._width_index
+
+        decision = None
+        if inference_latency > budget:
+            if self._width_index < last_width:
+                self._width_index += 1
+                decision = f"inference over budget: width {self.inference_width}"
+            elif self.stride < self.max_stride:
+                self.stride += 1
+                decision = f"inference over budget: stride {self.stride}"
+            elif self.stabilize:
+                self.stabilize = False
+                decision = "inference over budget: stabilization off"
+        elif frame_latency > budget:
+            if self.stabilize:
+                self.stabilize = False
+                decision = "frame over budget: stabilization off"
+            elif self.stride < self.max_stride:
+                self.stride += 1
+                decision = f"frame over budget: stride {self.stride}"
+            elif self._width_index < last_width:
+                self._width_index += 1
+                decision = f"frame over budget: width {self.inference_width}"
+        if decision:
+            self._hold_until = now + self.hold_seconds
+        elif (max(inference_latency, frame_latency) < budget * self.headroom
+              and now >= self._hold_until):
+            # Spare budget: inference rate first, then resolution, then stabilization
+            if self.stride > 1 and self._sustainable(self.stride - 1, self._width_index):
+                self.stride -= 1
+                decision = f"headroom: stride {self.stride}"
+            elif self._width_index > 0 and self._sustainable(self.stride, self._width_index - 1):
+                self._width_index -= 1
+                decision = f"headroom: width {self.inference_width}"
+            elif self._allow_stabilize and not self.stabilize:
+                self.stabilize = True
+                decision = "headroom: stabilization on"
+
+        if decision:
+            self.adjustments += 1
+            self.last_decision = decision
+            # Latencies measured under the old settings no longer apply
+            self._timings.pop("inference_latency", None)
+            self._timings.pop("frame_latency", None)
+            if self._width_index != width_index:
+                self._timings.pop("inference", None)
+
+    def _sustainable(self, stride: int, width_index: int) -> bool:
+        """Predict whether inference keeps up with the camera at these settings"""
+        inference = self._timings.get("inference")
+        interval = self._timings.get("capture_interval")
+        if inference is None or interval is None:
+            return True
+        predicted = inference
+        if self.widths:
+            # Inference cost grows roughly with the pixel count
+            predicted *= (self.widths[width_index] / self.widths[self._width_index]) ** 2
+        return (predicted < self.latency_budget * self.headroom
+                and predicted <= 0.9 * self.workers * stride * interval)
+
+    def status(self) -> dict:
+        """Current decisions and smoothed timings for a JSON response"""
+        with self._lock:
+            timings = {stage: round(self._timings[stage] * 1000, 1)
+                       for stage in STAGES if stage in self._timings}
+        return {
+            'latency_budget_ms': round(self.latency_budget * 1000),
+            'stride': self.stride,
+            'max_inference_rate': self.max_inference_rate,
+            'inference_width': self.inference_width,
+            'stabilize': self.stabilize,
+            'adjustments': self.adjustments,
+            'last_decision': self.last_decision,
+            'timings_ms': timings
+        }
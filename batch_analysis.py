@@ -0,0 +1,304 @@
+"""Offline emotion analysis of a video file or a directory of images
+
+Frames are decoded by a producer thread and analyzed by a pool of worker
+processes, each of which loads the emotion backend once. Results are
+written one row per detected face (a frame without faces gets one row with
+empty face fields) as CSV, JSON Lines or Parquet:
+
+    python batch_analysis.py clip.mp4 -o results.csv --workers 4
+    python batch_analysis.py photos/ -o results.jsonl --backend haar
+
+No camera is needed, so this also runs on headless build machines.
+"""
+
+import argparse
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import BATCH_QUEUE_SIZE, BATCH_WORKERS, EMOTION_BACKEND, INFERENCE_WIDTH
+from emotion_classifier import EMOTION_LABELS
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+FIELDS = ("frame", "source", "time_ms", "face", "x", "y", "w", "h",
+          "emotion", "confidence") + EMOTION_LABELS
+
+# (frame index, source name, position in ms or None)
+FrameInfo = Tuple[int, str, Optional[float]]
+
+# Rows buffered per Parquet row group, so memory stays bounded on long videos
+PARQUET_ROW_GROUP_SIZE = 10_000
+
+
+def iter_frames(source: str, stride: int = 1) -> Iterator[Tuple[FrameInfo, np.ndarray]]:
+    """Decode every ``stride``-th frame of a video file or image directory"""
+    stride = max(1, stride)
+    if os.path.isdir(source):
+        names = sorted(name for name in os.listdir(source)
+                       if name.lower().endswith(IMAGE_EXTENSIONS))
+        for index, name in enumerate(names[::stride]):
+            image = cv2.imread(os.path.join(source, name))
+            if image is not None:
+                yield (index * stride, name, None), image
+        return
+
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise ValueError(f"Cannot open video source '{source}'")
+    name = os.path.basename(source)
+    index = 0
+    try:
+        while True:
+            if index % stride:
+                # Skip without decoding
+                if not capture.grab():
+                    break
+            else:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                yield (index, name, capture.get(cv2.CAP_PROP_POS_MSEC)), frame
+            index += 1
+    finally:
+        capture.release()
+
+
+_worker_backend = None
+
+
+def _init_worker(backend: str, inference_width: Optional[int]):
+    """Load the emotion backend once per worker process"""
+    global _worker_backend
+    from emotion_backends import get_backend
+    _worker_backend = get_backend(backend, inference_width=inference_width)
+
+
+def _analyze(frame) -> List[dict]:
+    return _worker_backend.detect_emotions(frame)
+
+
+_DONE = object()
+
+
+def _produce(frames: Iterator, out: "queue.Queue", errors: list):
+    try:
+        for item in frames:
+            out.put(item)
+    except Exception as e:
+        errors.append(e)
+    finally:
+        out.put(_DONE)
+
+
+def analyze_frames(source: str, backend: str = EMOTION_BACKEND, workers: Optional[int] = BATCH_WORKERS,
+                   stride: int = 1, inference_width: Optional[int] = INFERENCE_WIDTH,
+                   queue_size: int = BATCH_QUEUE_SIZE) -> Iterator[Tuple[FrameInfo, List[dict]]]:
+    """Yield ``((index, name, time_ms), faces)`` per frame, in frame order
+
+    ``faces`` are FER-style ``{'box', 'emotions'}`` dicts. ``workers=0``
+    analyzes in this process; otherwise at most ``2 * workers`` frames are in
+    flight so memory stays bounded however long the video is.
+    """
+    frames: "queue.Queue" = queue.Queue(maxsize=max(1, queue_size))
+    errors: list = []
+    producer = threading.Thread(target=_produce, args=(iter_frames(source, stride), frames, errors),
+                                name="batch-decode", daemon=True)
+    producer.start()
+
+    def decoded():
+        while True:
+            item = frames.get()
+            if item is _DONE:
+                break
+            yield item
+
+    if workers == 0:
+        _init_worker(backend, inference_width)
+        for info, image in decoded():
+            yield info, _analyze(image)
+    else:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(backend, inference_width)) as pool:
+            in_flight = deque()
+            for info, image in decoded():
+                in_flight.append((info, pool.submit(_analyze, image)))
+                if len(in_flight) >= 2 * workers:
+                    info, future = in_flight.popleft()
+                    yield info, future.result()
+            while in_flight:
+                info, future = in_flight.popleft()
+                yield info, future.result()
+
+    producer.join()
+    if errors:
+        raise errors[0]
+
+
+def face_rows(info: FrameInfo, faces: List[dict]) -> Iterator[Dict]:
+    """Flatten one frame's results into output rows, one per face
+
+    A frame without faces still gets a row, with the face fields empty, so
+    every analyzed frame appears in the output.
+    """
+    index, name, time_ms = info
+    if not faces:
+        row = dict.fromkeys(FIELDS)
+        row.update(frame=index, source=name,
+                   time_ms=round(time_ms, 1) if time_ms is not None else None)
+        yield row
+        return
+    for number, face in enumerate(faces):
+        emotions = face['emotions']
+        emotion = max(emotions, key=emotions.get)
+        x, y, w, h = (int(v) for v in face['box'])
+        row = {
+            "frame": index, "source": name,
+            "time_ms": round(time_ms, 1) if time_ms is not None else None,
+            "face": number, "x": x, "y": y, "w": w, "h": h,
+            "emotion": emotion, "confidence": emotions[emotion]
+        }
+        row.update((label, emotions.get(label, 0.0)) for label in EMOTION_LABELS)
+        yield row
+
+
+class ResultWriter:
+    """Writes result rows as CSV, JSON Lines or Parquet (chosen by extension)
+
+    Parquet rows are written in row groups of ``row_group_size`` rows.
+    """
+
+    def __init__(self, path: str, fmt: Optional[str] = None,
+                 row_group_size: int = PARQUET_ROW_GROUP_SIZE):
+        self.path = path
+        self.format = fmt or self._format_for(path)
+        self.row_group_size = max(1, row_group_size)
+        self.rows = 0
+        self._file = None
+        self._buffer: List[Dict] = []
+        self._parquet = None
+        if self.format == "csv":
+            self._file = open(path, 'w', newline='', encoding='utf-8')
+            self._csv = csv.DictWriter(self._file, fieldnames=FIELDS)
+            self._csv.writeheader()
+        elif self.format == "jsonl":
+            self._file = open(path, 'w', encoding='utf-8')
+        elif self.format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            # Fixed types, since a row group of face-less frames is all nulls
+            types = dict(frame=pa.int64(), source=pa.string(), time_ms=pa.float64(),
+                         face=pa.int64(), x=pa.int64(), y=pa.int64(), w=pa.int64(),
+                         h=pa.int64(), emotion=pa.string())
+            self._schema = pa.schema([(field, types.get(field, pa.float64())) for field in FIELDS])
+            self._parquet = pq.ParquetWriter(path, self._schema)
+        else:
+            raise ValueError(f"Unsupported output format '{self.format}'")
+
+    @staticmethod
+    def _format_for(path: str) -> str:
+        extension = os.path.splitext(path)[1].lower()
+        return {".csv": "csv", ".jsonl": "jsonl", ".json": "jsonl",
+                ".parquet": "parquet", ".pq": "parquet"}.get(extension, "jsonl")
+
+    def write(self, row: Dict):
+        self.rows += 1
+        if self.format == "csv":
+            self._csv.writerow(row)
+        elif self.format == "jsonl":
+            self._file.write(json.dumps(row) + '\n')
+        else:
+            self._buffer.append(row)
+            if len(self._buffer) >= self.row_group_size:
+                self._flush_row_group()
+
+    def _flush_row_group(self):
+        import pyarrow as pa
+        columns = {field: [row[field] for row in self._buffer] for field in FIELDS}
+        self._parquet.write_table(pa.table(columns, schema=self._schema))
+        self._buffer = []
+
+    def close(self):
+        if self._parquet is not None:
+            if self._buffer:
+                self._flush_row_group()
+            self._parquet.close()
+            self._parquet = None
+        elif self._file:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def analyze_source(source: str, output: str, fmt: Optional[str] = None, **kwargs) -> Dict:
+    """Analyze a video file or image directory and write per-face rows to ``output``
+
+    Keyword arguments go to ``analyze_frames``. Returns a summary dict.
+    """
+    started = time.perf_counter()
+    frames = faces = 0
+    emotion_counts: Dict[str, int] = {}
+    with ResultWriter(output, fmt) as writer:
+        for info, results in analyze_frames(source, **kwargs):
+            frames += 1
+            for row in face_rows(info, results):
+                if row["face"] is not None:
+                    faces += 1
+                    emotion_counts[row["emotion"]] = emotion_counts.get(row["emotion"], 0) + 1
+                writer.write(row)
+    elapsed = time.perf_counter() - started
+    return {
+        "source": source,
+        "output": output,
+        "frames": frames,
+        "faces": faces,
+        "emotions": emotion_counts,
+        "seconds": round(elapsed, 2),
+        "fps": round(frames / elapsed, 2) if elapsed > 0 else 0.0
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze emotions in a video file or image directory")
+    parser.add_argument("source", help="video file or directory of images")
+    parser.add_argument("-o", "--output", help="results file (.csv, .jsonl or .parquet); "
+                                               "default <source>_emotions.jsonl")
+    parser.add_argument("--format", choices=("csv", "jsonl", "parquet"),
+                        help="output format (default: from the file extension)")
+    parser.add_argument("--backend", default=EMOTION_BACKEND, help="emotion backend name")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS,
+                        help="worker processes (0 = analyze in this process)")
+    parser.add_argument("--stride", type=int, default=1, help="analyze every N-th frame")
+    parser.add_argument("--inference-width", type=int, default=INFERENCE_WIDTH,
+                        help="face detection width in pixels")
+    args = parser.parse_args(argv)
+
+    output = args.output or os.path.splitext(args.source.rstrip("/\\"))[0] + "_emotions.jsonl"
+    summary = analyze_source(args.source, output, fmt=args.format, backend=args.backend,
+                             workers=args.workers, stride=args.stride,
+                             inference_width=args.inference_width)
+    print(f"📼 Analyzed {summary['frames']} frames ({summary['fps']} fps), "
+          f"{summary['faces']} faces -> {summary['output']}")
+    for emotion, count in sorted(summary["emotions"].items(), key=lambda x: x[1], reverse=True):
+        print(f"  • {emotion}: {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
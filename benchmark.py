@@ -0,0 +1,387 @@
+"""Reproducible performance benchmarks for the mood detection stages
+
+Every stage is driven with deterministic inputs instead of a camera or a
+microphone: synthetic frames (a drawn face moving over a textured, shaking
+background) or a recorded clip, fixed transcripts and generated mood
+histories. Each benchmark reports throughput, mean/p50/p99 latency and the
+peak memory allocated while it runs:
+
+    python benchmark.py -o results.json
+    python benchmark.py --quick --baseline baseline.json
+    python benchmark.py --video clip.mp4 --only stabilizer,mjpeg
+    python benchmark.py --write-clip clip.avi   # save the synthetic frames
+
+With ``--baseline`` the results are compared against a stored results file
+and the exit code is 1 if any benchmark got slower than ``--tolerance``.
+Runs headless: no camera, microphone, display or network is needed.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import EMOTION_BACKEND, INFERENCE_WIDTH
+
+BENCHMARKS = ("stabilizer", "enhance_frame", "detect_face_region", "emotion",
+              "match_feeling", "analyze_voice_mood", "mood_logger", "mjpeg")
+HISTORY_SIZES = (10_000, 100_000, 1_000_000)
+
+TRANSCRIPTS = (
+    "I am so happy today, everything is wonderful",
+    "I feel really down and tired of everything",
+    "this traffic makes me furious",
+    "I'm worried about the exam tomorrow",
+    "not bad, just an ordinary afternoon",
+    "I'm over the moon about the news",
+    "honestly I am fed up with this",
+    "we had a great time at the park",
+)
+MOODS = ("happy", "sad", "angry", "neutral", "fear", "surprise", "disgust")
+
+# One timed call, given the iteration number
+Step = Callable[[int], object]
+
+
+def synthetic_frames(count: int = 60, width: int = 640, height: int = 480,
+                     seed: int = 0) -> List[np.ndarray]:
+    """Deterministic BGR frames: a face-like shape on a shaking textured background"""
+    rng = np.random.default_rng(seed)
+    texture = rng.integers(40, 200, size=(height + 40, width + 40, 3), dtype=np.uint8)
+    texture = cv2.GaussianBlur(texture, (0, 0), 3)
+    frames = []
+    for i in range(count):
+        # Camera shake: a small deterministic offset of the background
+        dx = int(10 + 8 * np.sin(i * 0.7))
+        dy = int(10 + 6 * np.cos(i * 0.5))
+        frame = texture[dy:dy + height, dx:dx + width].copy()
+        cx = int(width / 2 + width / 6 * np.sin(i * 0.1))
+        cy = height // 2
+        size = height // 5
+        cv2.ellipse(frame, (cx, cy), (size, int(size * 1.3)), 0, 0, 360, (150, 180, 220), -1)
+        for ex in (cx - size // 2, cx + size // 2):
+            cv2.circle(frame, (ex, cy - size // 3), size // 8, (40, 40, 40), -1)
+        mouth = int(size * 0.2 * (1 + np.sin(i * 0.3)))
+        cv2.ellipse(frame, (cx, cy + size // 2), (size // 2, max(mouth, 2)), 0, 0, 180, (60, 60, 160), 3)
+        frame += rng.integers(0, 8, size=frame.shape, dtype=np.uint8)
+        frames.append(frame)
+    return frames
+
+
+def video_frames(path: str, count: int = 60) -> List[np.ndarray]:
+    """First ``count`` frames of a recorded clip"""
+    from batch_analysis import iter_frames
+    frames = []
+    for _, frame in iter_frames(path):
+        frames.append(frame)
+        if len(frames) >= count:
+            break
+    if not frames:
+        raise ValueError(f"No frames could be read from '{path}'")
+    return frames
+
+
+def write_clip(frames: List[np.ndarray], path: str, fps: float = 30.0):
+    """Save frames as a video so the same input can be replayed with ``--video``"""
+    height, width = frames[0].shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+
+
+def measure(step: Step, iterations: int, warmup: int = 3,
+            memory_iterations: int = 20) -> Dict[str, float]:
+    """Time ``iterations`` calls of ``step``, then track allocations over a few more"""
+    for i in range(warmup):
+        step(i)
+    timings = np.empty(iterations, dtype=np.float64)
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        step(warmup + i)
+        timings[i] = time.perf_counter() - t0
+    elapsed = time.perf_counter() - started
+
+    # tracemalloc slows everything down, so allocations get a separate pass
+    tracemalloc.start()
+    try:
+        for i in range(min(iterations, memory_iterations)):
+            step(warmup + iterations + i)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'iterations': iterations,
+        'throughput_per_s': round(iterations / elapsed, 2),
+        'mean_ms': round(float(timings.mean()) * 1000, 4),
+        'p50_ms': round(float(np.percentile(timings, 50)) * 1000, 4),
+        'p99_ms': round(float(np.percentile(timings, 99)) * 1000, 4),
+        'peak_alloc_kb': round(peak / 1024, 1)
+    }
+
+
+def _cycle(frames: List[np.ndarray], fn: Callable[[np.ndarray], object]) -> Step:
+    return lambda i: fn(frames[i % len(frames)])
+
+
+def bench_stabilizer(frames, iterations):
+    from video_stabilizer import VideoStabilizer
+    from config import (STABILIZER_SMOOTHING_WINDOW, STABILIZER_RESEED_INTERVAL,
+                        STABILIZER_MIN_POINTS, STABILIZER_FLOW_SCALE, STABILIZER_SMOOTHING_MODE)
+    stabilizer = VideoStabilizer(smoothing_window=STABILIZER_SMOOTHING_WINDOW,
+                                 reseed_interval=STABILIZER_RESEED_INTERVAL,
+                                 min_points=STABILIZER_MIN_POINTS,
+                                 flow_scale=STABILIZER_FLOW_SCALE,
+                                 smoothing_mode=STABILIZER_SMOOTHING_MODE)
+    step = _cycle(frames, lambda f: stabilizer.smooth_frame(stabilizer.stabilize_frame(f)))
+    return {'stabilizer': measure(step, iterations)}
+
+
+def bench_enhance_frame(frames, iterations):
+    from utils import enhance_frame
+    out = np.empty_like(frames[0])
+    return {'enhance_frame': measure(_cycle(frames, lambda f: enhance_frame(f, out)), iterations)}
+
+
+def bench_detect_face_region(frames, iterations):
+    from utils import detect_face_region
+    return {'detect_face_region': measure(_cycle(frames, detect_face_region), iterations)}
+
+
+def bench_emotion(frames, iterations, backend=EMOTION_BACKEND):
+    from emotion_backends import get_backend
+    detector = get_backend(backend, inference_width=INFERENCE_WIDTH)
+    # Model inference is slow: fewer iterations keep the run short
+    return {f'emotion[{backend}]': measure(_cycle(frames, detector.detect_emotions),
+                                          max(10, iterations // 4), memory_iterations=5)}
+
+
+def _voice_functions():
+    # The web app's own functions and feelings lexicon, without importing
+    # web_mood_app (which opens the mood history and starts threads)
+    import voice_mood
+    return voice_mood.match_feeling, voice_mood.analyze_voice_mood
+
+
+def bench_match_feeling(frames, iterations):
+    match_feeling, _ = _voice_functions()
+    step = lambda i: match_feeling(TRANSCRIPTS[i % len(TRANSCRIPTS)])
+    return {'match_feeling': measure(step, iterations * 10)}
+
+
+def bench_analyze_voice_mood(frames, iterations):
+    _, analyze_voice_mood = _voice_functions()
+    step = lambda i: analyze_voice_mood(TRANSCRIPTS[i % len(TRANSCRIPTS)])
+    return {'analyze_voice_mood': measure(step, iterations * 10)}
+
+
+def write_history(path: str, size: int, seed: int = 0):
+    """Generate a JSON Lines mood history of ``size`` entries, one per 5 seconds"""
+    rng = np.random.default_rng(seed)
+    moods = rng.integers(0, len(MOODS), size)
+    confidences = rng.random(size).round(2)
+    start = datetime(2026, 1, 1)
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(size):
+            f.write(json.dumps({
+                "timestamp": (start + timedelta(seconds=5 * i)).isoformat(),
+                "mood": MOODS[moods[i]],
+                "confidence": float(confidences[i]),
+                "method": "facial" if i % 4 else "voice",
+                "notes": ""
+            }) + '\n')
+
+
+def bench_mood_logger(frames, iterations, sizes=HISTORY_SIZES):
+    from mood_logger import MoodLogger
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="mood-bench-")
+    try:
+        for size in sizes:
+            path = os.path.join(workdir, f"history_{size}.json")
+            write_history(path, size)
+
+            loaded = []
+            load = lambda i: loaded.append(MoodLogger(path, flush_interval=3600))
+            results[f'mood_logger.load[{size}]'] = measure(load, 2, warmup=0, memory_iterations=1)
+            logger = loaded[0]
+            for other in loaded[1:]:
+                other.close()
+
+            step = lambda i: logger.log_mood(MOODS[i % len(MOODS)], 0.8, "facial")
+            results[f'mood_logger.log_mood[{size}]'] = measure(step, iterations * 10)
+            logger.flush()
+
+            summary = lambda i: logger.get_range_summary()
+            results[f'mood_logger.summary[{size}]'] = measure(summary, 20, memory_iterations=3)
+            logger.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def bench_mjpeg(frames, iterations):
+    from config import STREAM_ENCODER, STREAM_JPEG_QUALITY, STREAM_MAX_WIDTH
+    from stream_encoder import StreamEncoder, part_header
+    encoder = StreamEncoder(quality=STREAM_JPEG_QUALITY, max_width=STREAM_MAX_WIDTH,
+                            backend=STREAM_ENCODER)
+
+    def step(i):
+        payload = encoder.encode(frames[i % len(frames)])
+        return part_header(len(payload)), payload
+    return {f'mjpeg[{encoder.backend}]': measure(step, iterations)}
+
+
+RUNNERS = {
+    "stabilizer": bench_stabilizer,
+    "enhance_frame": bench_enhance_frame,
+    "detect_face_region": bench_detect_face_region,
+    "emotion": bench_emotion,
+    "match_feeling": bench_match_feeling,
+    "analyze_voice_mood": bench_analyze_voice_mood,
+    "mood_logger": bench_mood_logger,
+    "mjpeg": bench_mjpeg,
+}
+
+
+def run_benchmarks(names=BENCHMARKS, frames: Optional[List[np.ndarray]] = None,
+                   iterations: int = 200, sizes=HISTORY_SIZES,
+                   backend: str = EMOTION_BACKEND) -> Dict:
+    """Run the named benchmarks; unavailable stages are reported as skipped"""
+    frames = frames if frames is not None else synthetic_frames()
+    results: Dict[str, Dict] = {}
+    for name in names:
+        kwargs = {}
+        if name == "mood_logger":
+            kwargs['sizes'] = sizes
+        elif name == "emotion":
+            kwargs['backend'] = backend
+        print(f"⏱️  {name}...", flush=True)
+        try:
+            results.update(RUNNERS[name](frames, iterations, **kwargs))
+        except ImportError as e:
+            # e.g. FER/TensorFlow not installed on this machine
+            results[name] = {'skipped': str(e)}
+        except Exception as e:
+            results[name] = {'skipped': f"{type(e).__name__}: {e}"}
+
+    max_rss_kb = None
+    try:
+        import resource
+        max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        pass
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'cpu_count': os.cpu_count(),
+            'frame_size': list(frames[0].shape[1::-1]),
+            'iterations': iterations,
+            'max_rss_kb': max_rss_kb
+        },
+        'results': results
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float = 0.2) -> List[Tuple[str, str]]:
+    """Print a comparison table; returns ``(benchmark, reason)`` for regressions"""
+    regressions = []
+    print(f"\n{'benchmark':<36}{'p50 ms':>12}{'baseline':>12}{'change':>10}")
+    for name, current in results['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if 'skipped' in current or not previous or 'skipped' in previous:
+            continue
+        change = current['p50_ms'] / previous['p50_ms'] - 1 if previous['p50_ms'] else 0.0
+        flag = ""
+        if change > tolerance:
+            regressions.append((name, f"p50 {previous['p50_ms']} -> {current['p50_ms']} ms"))
+            flag = " ⚠️"
+        elif previous['throughput_per_s'] > current['throughput_per_s'] * (1 + tolerance):
+            regressions.append((name, f"throughput {previous['throughput_per_s']} -> "
+                                      f"{current['throughput_per_s']}/s"))
+            flag = " ⚠️"
+        print(f"{name:<36}{current['p50_ms']:>12.3f}{previous['p50_ms']:>12.3f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def print_results(results: Dict):
+    print(f"\n{'benchmark':<36}{'ops/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'peak KB':>10}")
+    for name, result in results['results'].items():
+        if 'skipped' in result:
+            print(f"{name:<36}  skipped: {result['skipped']}")
+            continue
+        print(f"{name:<36}{result['throughput_per_s']:>12.1f}{result['p50_ms']:>10.3f}"
+              f"{result['p99_ms']:>10.3f}{result['peak_alloc_kb']:>10.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the mood detection stages headlessly")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="results JSON file")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown before a benchmark counts as a regression (0.2 = 20%%)")
+    parser.add_argument("--only", help=f"comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--iterations", type=int, default=200, help="timed iterations per frame stage")
+    parser.add_argument("--quick", action="store_true",
+                        help="fewer iterations and no 1M-entry history")
+    parser.add_argument("--video", help="use frames from a recorded clip instead of synthetic ones")
+    parser.add_argument("--frames", type=int, default=60, help="number of distinct input frames")
+    parser.add_argument("--backend", default=EMOTION_BACKEND, help="emotion backend to benchmark")
+    parser.add_argument("--write-clip", help="save the synthetic frames as a video and exit")
+    args = parser.parse_args(argv)
+
+    if args.write_clip:
+        write_clip(synthetic_frames(args.frames), args.write_clip)
+        print(f"🎞️  Wrote {args.frames} synthetic frames to {args.write_clip}")
+        return 0
+
+    names = BENCHMARKS
+    if args.only:
+        names = tuple(name.strip() for name in args.only.split(",") if name.strip())
+        unknown = [name for name in names if name not in RUNNERS]
+        if unknown:
+            parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    iterations, sizes = args.iterations, HISTORY_SIZES
+    if args.quick:
+        iterations, sizes = max(10, iterations // 4), HISTORY_SIZES[:2]
+    frames = video_frames(args.video, args.frames) if args.video else synthetic_frames(args.frames)
+
+    results = run_benchmarks(names, frames, iterations, sizes, args.backend)
+    results['meta']['source'] = args.video or "synthetic"
+    print_results(results)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n⚠️  {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for name, reason in regressions:
+                print(f"  • {name}: {reason}")
+            return 1
+        print("\n✅ No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,34 @@ CAMERA_INDEX = 0
 FRAME_CAPTURE_COUNT = 30
 SCAN_DURATION_SECONDS = 3
 
+# Video stabilization
+STABILIZER_SMOOTHING_WINDOW = 5
+STABILIZER_RESEED_INTERVAL = 10  # Frames between goodFeaturesToTrack calls
+STABILIZER_MIN_POINTS = 50  # Re-seed early when fewer points are tracked
+STABILIZER_FLOW_SCALE = 0.5  # Optical flow runs on a downscaled gray frame
+STABILIZER_SMOOTHING_MODE = "window"  # "window" (box average) or "ema"
+
+# Emotion backend: "fer-mtcnn", "fer", "haar", "opencv-dnn" or "deepface"
+EMOTION_BACKEND = "fer-mtcnn"
+# Caffe res10 SSD face detector files for the "opencv-dnn" backend
+DNN_FACE_PROTOTXT = None
+DNN_FACE_MODEL = None
+
+# Run the emotion models once on a blank frame while loading in the background
+MODEL_WARMUP = True
+
+# Face detection runs on a copy scaled to this width (None = full resolution)
+INFERENCE_WIDTH = 640
+
+# Face tracking: full face detection only every N frames, tracked in between
+FACE_TRACKING_ENABLED = True
+FACE_DETECT_INTERVAL = 10
+FACE_TRACK_MIN_RATIO = 0.5  # Re-detect when fewer tracked points survive
+
+# Offline analysis (batch_analysis.py)
+BATCH_WORKERS = 2  # Worker processes, each loading the emotion model once
+BATCH_QUEUE_SIZE = 16  # Decoded frames buffered ahead of the workers
+
 # Confidence thresholds
 MIN_EMOTION_CONFIDENCE = 0.3
 MIN_FACE_DETECTION_CONFIDENCE = 0.5
@@ -20,3 +48,39 @@ NEGATIVE_THRESHOLD = -0.3
 # Logging
 ENABLE_MOOD_HISTORY = True
 HISTORY_FILE = "mood_history.json"
+HISTORY_MMAP_DIR = None  # e.g. "mood_history.cols" to memory-map the history columns
+SEGMENT_SWITCH_FRAMES = 3  # Frames a new mood must last before a new segment starts
+SEGMENT_MAX_SECONDS = 60.0  # Log long segments once per window (None = never split)
+SEGMENT_GAP_SECONDS = 2.0  # Close the segment when no face was seen this long
+
+# Video pipeline settings
+INFERENCE_WORKERS = 1
+PIPELINE_QUEUE_SIZE = 2
+PIPELINE_DROP_OLDEST = True  # False drops the newest frame instead
+STREAM_SUBSCRIBER_QUEUE_SIZE = 1  # Frames buffered per /video_feed client
+EMOTION_PUSH_MAX_RATE = 10  # Max /emotion_stream events per second per client
+EMOTION_PUSH_KEEPALIVE = 15  # Seconds between keepalives on an idle /emotion_stream
+ENABLE_PIPELINE_METRICS = True  # Stage timings, latencies and drops on /metrics
+
+# Stream encoding (/video_feed)
+STREAM_JPEG_QUALITY = 80  # 1-100; lower is smaller and faster
+STREAM_MAX_WIDTH = None  # Scale streamed frames down to this width, e.g. 960 (None = camera size)
+STREAM_ENCODER = "auto"  # "auto", "opencv" or "turbojpeg" (PyTurboJPEG + libjpeg-turbo)
+STREAM_SKIP_UNCHANGED = True  # Reuse the last JPEG when frame and overlay didn't change
+STREAM_OVERLAY = "server"  # "server" draws boxes and bars into the video; "client" streams
+                           # clean video and the browser draws from /overlay_stream
+
+# Adaptive scheduling: adjust inference stride, inference width and
+# stabilization to keep capture-to-stream latency under the budget
+ADAPTIVE_SCHEDULING = True
+LATENCY_BUDGET_MS = 150
+ADAPTIVE_WIDTHS = (640, 480, 320)  # Inference widths, tried largest first
+ADAPTIVE_MAX_STRIDE = 6  # Analyze at least every N-th frame
+MAX_INFERENCE_RATE = None  # Cap emotion inference (per second), e.g. 4; smoothing keeps the overlay steady
+
+# Temporal smoothing of emotion scores (per face)
+EMOTION_SMOOTHING = "ema"  # "ema", "window" or None to show raw per-frame scores
+EMOTION_SMOOTHING_TIME_CONSTANT = 0.5  # Seconds; EMA weight follows the inference rate
+EMOTION_SMOOTHING_WINDOW = 5  # Samples averaged in "window" mode
+EMOTION_SWITCH_MARGIN = 0.1  # Lead another emotion needs over the shown one
+EMOTION_SWITCH_FRAMES = 2  # Consecutive updates it must lead before the label changes
@@ -0,0 +1,287 @@
+"""Pluggable face detection + emotion classification backends
+
+Every backend exposes the same interface (``find_faces``, ``classify_faces``,
+``detect_emotions`` and ``analyze``) and result type, so deployments can pick
+a fast detector on low-end hardware and MTCNN or DeepFace where accuracy
+matters, and all of them can be benchmarked on equal footing.
+
+    backend = get_backend("haar")
+    for face in backend.analyze(frame):
+        print(face.box, face.emotion, face.confidence)
+"""
+
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from emotion_classifier import (EMOTION_LABELS, EmotionClassifier, downscale_for_inference,
+                                scale_boxes, scores_to_results)
+from utils import FaceRegionDetector
+
+Box = Tuple[int, int, int, int]
+
+
+@dataclass
+class FaceResult:
+    """Emotion scores for one detected face"""
+    box: Box
+    emotions: Dict[str, float]
+
+    @property
+    def emotion(self) -> str:
+        return max(self.emotions, key=self.emotions.get)
+
+    @property
+    def confidence(self) -> float:
+        return self.emotions[self.emotion]
+
+    def to_dict(self) -> dict:
+        return {
+            'box': list(self.box),
+            'emotion': self.emotion,
+            'confidence': self.confidence,
+            'emotions': self.emotions
+        }
+
+
+class EmotionBackend:
+    """Base class: subclasses implement ``find_faces`` and ``classify_boxes``"""
+
+    name = "base"
+
+    def find_faces(self, frame: np.ndarray, inference_width: Optional[int] = None) -> List[Box]:
+        """Locate faces as (x, y, w, h) boxes in frame coordinates
+
+        Detection may run on a copy scaled down to ``inference_width``
+        (default: the width the backend was created with).
+        """
+        raise NotImplementedError
+
+    def classify_boxes(self, frame: np.ndarray, boxes: Sequence[Box]) -> Tuple[np.ndarray, List[Box]]:
+        """Score faces, returning an (n, 7) matrix and the boxes it covers"""
+        raise NotImplementedError
+
+    def classify_faces(self, frame: np.ndarray, boxes: Sequence[Box]) -> np.ndarray:
+        """Return an (n_faces, 7) score matrix in ``EMOTION_LABELS`` order"""
+        return self.classify_boxes(frame, boxes)[0]
+
+    def detect_emotions(self, frame: np.ndarray,
+                        face_rectangles: Optional[Sequence[Box]] = None,
+                        inference_width: Optional[int] = None) -> List[dict]:
+        """FER-compatible ``[{'box', 'emotions'}]`` results
+
+        Faces are always classified from the full-resolution ``frame``.
+        """
+        if face_rectangles is None:
+            face_rectangles = self.find_faces(frame, inference_width)
+        scores, boxes = self.classify_boxes(frame, face_rectangles)
+        return scores_to_results(boxes, scores)
+
+    def analyze(self, frame: np.ndarray) -> List[FaceResult]:
+        """Detect and classify every face in a frame"""
+        return [FaceResult(tuple(face['box']), face['emotions'])
+                for face in self.detect_emotions(frame)]
+
+    def warm_up(self, frame_size: Tuple[int, int] = (480, 640)):
+        """Run the detector and classifier once so the first real frame is fast"""
+        blank = np.zeros(frame_size + (3,), dtype=np.uint8)
+        self.find_faces(blank)
+        self.classify_faces(blank, [(0, 0, 64, 64)])
+
+
+class FERBackend(EmotionBackend):
+    """FER emotion model with either MTCNN or FER's own Haar cascade detector"""
+
+    name = "fer"
+
+    def __init__(self, mtcnn: bool = True, inference_width: Optional[int] = None):
+        from fer import FER
+
+        if mtcnn:
+            self.name = "fer-mtcnn"
+        self.classifier = EmotionClassifier(FER(mtcnn=mtcnn), inference_width=inference_width)
+
+    def find_faces(self, frame, inference_width=None):
+        return self.classifier.find_faces(frame, inference_width)
+
+    def classify_boxes(self, frame, boxes):
+        return self.classifier.classify_boxes(frame, boxes)
+
+
+class _OpenCVDetectorBackend(FERBackend):
+    """FER emotion model behind a plain OpenCV face detector"""
+
+    def __init__(self, inference_width: Optional[int] = None):
+        # Faces are found by _detect; FER only provides the emotion model
+        super().__init__(mtcnn=False, inference_width=inference_width)
+        self.inference_width = inference_width
+
+    def find_faces(self, frame, inference_width=None):
+        small, factor = downscale_for_inference(frame, inference_width or self.inference_width)
+        return scale_boxes(self._detect(small), factor)
+
+    def _detect(self, frame: np.ndarray) -> List[Box]:
+        raise NotImplementedError
+
+
+class HaarBackend(_OpenCVDetectorBackend):
+    """Fast OpenCV Haar cascade detector, suited to low-end kiosks"""
+
+    name = "haar"
+
+    def __init__(self, inference_width: Optional[int] = None,
+                 scale_factor: float = 1.3, min_neighbors: int = 5):
+        super().__init__(inference_width=inference_width)
+        self.face_detector = FaceRegionDetector(scale_factor=scale_factor,
+                                                min_neighbors=min_neighbors)
+
+    def _detect(self, frame):
+        return self.face_detector.detect_all(frame)
+
+
+class DNNBackend(_OpenCVDetectorBackend):
+    """OpenCV DNN (res10 SSD) face detector
+
+    Needs the Caffe model files configured as ``DNN_FACE_PROTOTXT`` and
+    ``DNN_FACE_MODEL`` in config.py (or passed in explicitly).
+    """
+
+    name = "opencv-dnn"
+
+    def __init__(self, inference_width: Optional[int] = None,
+                 prototxt: Optional[str] = None, model: Optional[str] = None,
+                 min_confidence: Optional[float] = None):
+        from config import DNN_FACE_PROTOTXT, DNN_FACE_MODEL, MIN_FACE_DETECTION_CONFIDENCE
+
+        prototxt = prototxt or DNN_FACE_PROTOTXT
+        model = model or DNN_FACE_MODEL
+        if not prototxt or not model:
+            raise ValueError("opencv-dnn backend needs DNN_FACE_PROTOTXT and DNN_FACE_MODEL")
+        super().__init__(inference_width=inference_width)
+        self.net = cv2.dnn.readNetFromCaffe(prototxt, model)
+        self.min_confidence = (MIN_FACE_DETECTION_CONFIDENCE
+                               if min_confidence is None else min_confidence)
+
+    def _detect(self, frame):
+        h, w = frame.shape[:2]
+        blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 1.0, (300, 300),
+                                     (104.0, 177.0, 123.0))
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]
+        detections = detections[detections[:, 2] >= self.min_confidence]
+        corners = np.clip(detections[:, 3:7], 0.0, 1.0) * np.array([w, h, w, h])
+        return [(int(x0), int(y0), int(x1 - x0), int(y1 - y0))
+                for x0, y0, x1, y1 in corners if x1 > x0 and y1 > y0]
+
+
+class DeepFaceBackend(EmotionBackend):
+    """DeepFace detection and emotion model (slower, more robust)"""
+
+    name = "deepface"
+
+    def __init__(self, detector_backend: str = "opencv", inference_width: Optional[int] = None):
+        from deepface import DeepFace
+
+        self._deepface = DeepFace
+        self.detector_backend = detector_backend
+        self.inference_width = inference_width
+
+    def _analyze(self, frame, detector_backend):
+        results = self._deepface.analyze(frame, actions=['emotion'], enforce_detection=False,
+                                         detector_backend=detector_backend)
+        if isinstance(results, dict):
+            results = [results]
+        return results
+
+    @staticmethod
+    def _scores(result) -> np.ndarray:
+        # DeepFace reports percentages
+        return np.array([result['emotion'].get(label, 0.0) for label in EMOTION_LABELS],
+                        dtype=np.float32) / 100.0
+
+    def find_faces(self, frame, inference_width=None):
+        return [box for box, _ in self._detect_and_score(frame, inference_width)]
+
+    def classify_boxes(self, frame, boxes):
+        scores, kept = [], []
+        for box in boxes:
+            x, y, w, h = (int(v) for v in box)
+            crop = frame[max(0, y):y + h, max(0, x):x + w]
+            if crop.size == 0:
+                continue
+            scores.append(self._scores(self._analyze(crop, 'skip')[0]))
+            kept.append((x, y, w, h))
+        if not kept:
+            return np.zeros((0, len(EMOTION_LABELS)), dtype=np.float32), []
+        return np.stack(scores), kept
+
+    def detect_emotions(self, frame, face_rectangles=None, inference_width=None):
+        if face_rectangles is not None:
+            return super().detect_emotions(frame, face_rectangles)
+        # Detection and classification in a single DeepFace call
+        found = self._detect_and_score(frame, inference_width)
+        return scores_to_results([box for box, _ in found],
+                                 [scores for _, scores in found])
+
+    def _detect_and_score(self, frame, inference_width=None) -> List[Tuple[Box, np.ndarray]]:
+        small, factor = downscale_for_inference(frame, inference_width or self.inference_width)
+        found = []
+        for result in self._analyze(small, self.detector_backend):
+            region = result['region']
+            box = (region['x'], region['y'], region['w'], region['h'])
+            found.append((scale_boxes([box], factor)[0], self._scores(result)))
+        return found
+
+
+_BACKENDS: Dict[str, Callable[..., EmotionBackend]] = {
+    "fer-mtcnn": lambda **kwargs: FERBackend(mtcnn=True, **kwargs),
+    "fer": lambda **kwargs: FERBackend(mtcnn=False, **kwargs),
+    "haar": HaarBackend,
+    "opencv-dnn": DNNBackend,
+    "deepface": DeepFaceBackend,
+}
+# Shared instances by (name, constructor kwargs)
+_instances: Dict[Tuple[str, frozenset], EmotionBackend] = {}
+
+
+def register_backend(name: str, factory: Callable[..., EmotionBackend]):
+    """Make a custom backend available to ``get_backend``"""
+    _BACKENDS[name] = factory
+    for key in [key for key in _instances if key[0] == name]:
+        del _instances[key]
+
+
+def available_backends() -> List[str]:
+    """Names of all registered backends"""
+    return sorted(_BACKENDS)
+
+
+def create_backend(name: str, **kwargs) -> EmotionBackend:
+    """Build a new backend instance"""
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown emotion backend '{name}'. "
+                         f"Available: {', '.join(available_backends())}")
+    return _BACKENDS[name](**kwargs)
+
+
+def get_backend(name: Optional[str] = None, **kwargs) -> EmotionBackend:
+    """Return a shared backend instance, loading its models on first use
+
+    ``name`` defaults to ``EMOTION_BACKEND`` from config.py. Instances are
+    shared per name and keyword arguments, so callers asking for different
+    settings (e.g. ``inference_width``) each get a backend built with them.
+    """
+    if name is None:
+        from config import EMOTION_BACKEND
+        name = EMOTION_BACKEND
+    key = (name, frozenset(kwargs.items()))
+    if key not in _instances:
+        _instances[key] = create_backend(name, **kwargs)
+    return _instances[key]
+
+
+def analyze(frame: np.ndarray, backend: Optional[str] = None) -> List[FaceResult]:
+    """Detect faces and emotions with the configured (or given) backend"""
+    return get_backend(backend).analyze(frame)
@@ -0,0 +1,127 @@
+"""Batched emotion classification for every face in a frame"""
+
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# Output order of the FER emotion model
+EMOTION_LABELS = ('angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral')
+
+Box = Tuple[int, int, int, int]
+
+
+def downscale_for_inference(frame: np.ndarray, max_width: Optional[int]) -> Tuple[np.ndarray, float]:
+    """Shrink a frame to at most ``max_width`` pixels wide
+
+    Returns the (possibly unchanged) frame and the factor that maps
+    coordinates on it back to the original frame.
+    """
+    width = frame.shape[1]
+    if not max_width or width <= max_width:
+        return frame, 1.0
+    scale = max_width / width
+    small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return small, width / small.shape[1]
+
+
+def scale_boxes(boxes: Sequence[Box], factor: float) -> List[Box]:
+    """Map (x, y, w, h) boxes by ``factor``, e.g. from a downscaled frame"""
+    if factor == 1.0:
+        return [tuple(int(v) for v in box) for box in boxes]
+    return [tuple(int(round(v * factor)) for v in box) for box in boxes]
+
+
+def scores_to_results(boxes: Sequence[Box], scores: np.ndarray) -> List[dict]:
+    """Convert a score matrix into FER-style ``[{'box', 'emotions'}]`` results"""
+    return [
+        {
+            'box': [int(v) for v in box],
+            'emotions': {label: round(float(score), 2)
+                         for label, score in zip(EMOTION_LABELS, row)},
+        }
+        for box, row in zip(boxes, scores)
+    ]
+
+
+class EmotionClassifier:
+    """Runs the FER emotion CNN once per frame on a batch of all faces
+
+    Faces are cropped from a single grayscale conversion of the frame,
+    resized straight into a preallocated batch and normalised in one NumPy
+    operation, so the cost of an extra face is one crop and resize rather
+    than a separate model call.
+
+    With ``inference_width`` set, face detection runs on a copy of the frame
+    scaled down to that width (or the ``inference_width`` given per call)
+    and the boxes are mapped back to the full frame, where the faces are
+    cropped for classification.
+    """
+
+    def __init__(self, detector, offsets: Tuple[int, int] = (10, 10),
+                 inference_width: Optional[int] = None):
+        self.detector = detector
+        self.offsets = offsets
+        self.inference_width = inference_width
+        self.target_size = getattr(detector, '_FER__emotion_target_size', (64, 64))
+
+    def find_faces(self, frame: np.ndarray, inference_width: Optional[int] = None) -> List[Box]:
+        """Locate faces with the wrapped detector, in full-frame coordinates"""
+        small, factor = downscale_for_inference(frame, inference_width or self.inference_width)
+        return scale_boxes(self.detector.find_faces(small, bgr=True), factor)
+
+    def prepare_batch(self, frame: np.ndarray, boxes: Sequence[Box]) -> Tuple[np.ndarray, List[Box]]:
+        """Crop, resize and normalise faces into a (n, h, w, 1) float32 batch
+
+        Boxes that fall completely outside the frame are skipped; the boxes
+        actually used are returned alongside the batch.
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        frame_h, frame_w = gray.shape[:2]
+        target_w, target_h = self.target_size
+        off_x, off_y = self.offsets
+
+        batch = np.empty((len(boxes), target_h, target_w), dtype=np.uint8)
+        kept = []
+        for box in boxes:
+            x, y, w, h = (int(v) for v in box)
+            # Square the box around its centre, as the FER model was trained on
+            side = max(w, h)
+            x -= (side - w) // 2
+            y -= (side - h) // 2
+            x0, y0 = max(0, x - off_x), max(0, y - off_y)
+            x1, y1 = min(frame_w, x + side + off_x), min(frame_h, y + side + off_y)
+            if x1 <= x0 or y1 <= y0:
+                continue
+            cv2.resize(gray[y0:y1, x0:x1], (target_w, target_h),
+                       dst=batch[len(kept)])
+            kept.append((int(box[0]), int(box[1]), int(box[2]), int(box[3])))
+
+        faces = batch[:len(kept)].astype(np.float32)
+        faces *= 2.0 / 255.0
+        faces -= 1.0
+        return faces[..., np.newaxis], kept
+
+    def classify_faces(self, frame: np.ndarray, boxes: Sequence[Box]) -> np.ndarray:
+        """Return an (n_faces, 7) score matrix in ``EMOTION_LABELS`` order"""
+        return self.classify_boxes(frame, boxes)[0]
+
+    def detect_emotions(self, frame: np.ndarray,
+                        face_rectangles: Optional[Sequence[Box]] = None,
+                        inference_width: Optional[int] = None) -> List[dict]:
+        """Drop-in replacement for ``FER.detect_emotions`` with batching"""
+        if face_rectangles is None:
+            face_rectangles = self.find_faces(frame, inference_width)
+        scores, boxes = self.classify_boxes(frame, face_rectangles)
+        return scores_to_results(boxes, scores)
+
+    def classify_boxes(self, frame: np.ndarray, boxes: Sequence[Box]) -> Tuple[np.ndarray, List[Box]]:
+        """Classify faces, returning the score matrix and the boxes it covers"""
+        if len(boxes) == 0:
+            return np.zeros((0, len(EMOTION_LABELS)), dtype=np.float32), []
+        faces, kept = self.prepare_batch(frame, boxes)
+        if not kept:
+            return np.zeros((0, len(EMOTION_LABELS)), dtype=np.float32), []
+        # One forward pass for the whole batch
+        scores = self.detector._classify_emotions(faces)
+        return np.asarray(scores, dtype=np.float32).reshape(len(kept), -1), kept
@@ -0,0 +1,191 @@
+"""Temporal smoothing of emotion scores with label hysteresis
+
+Single-frame emotion scores are noisy; taking ``max(emotions)`` per frame
+makes the displayed mood flicker. ``EmotionSmoother`` keeps a running
+estimate of the whole 7-dim score vector, updated in O(1):
+
+- ``"ema"``: exponential moving average; with ``time_constant`` set the
+  weight of each sample follows the time since the previous one, so the
+  output is equally smooth whether inference runs at 3 Hz or 30 Hz
+- ``"window"``: mean over the last ``window`` samples (NumPy ring buffer
+  with a running sum)
+
+The reported label only changes when another emotion leads the current
+one by ``switch_margin`` for ``switch_frames`` consecutive updates.
+``FaceSmoother`` keeps one smoother per face, matching faces across frames
+by box overlap.
+"""
+
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from emotion_classifier import EMOTION_LABELS
+
+Box = Tuple[int, int, int, int]
+
+
+class EmotionSmoother:
+    """O(1) streaming smoother over emotion score vectors"""
+
+    def __init__(self, mode: str = "ema", alpha: float = 0.3,
+                 time_constant: Optional[float] = None, window: int = 5,
+                 switch_margin: float = 0.1, switch_frames: int = 2,
+                 labels: Sequence[str] = EMOTION_LABELS):
+        if mode not in ("ema", "window"):
+            raise ValueError(f"Unknown smoothing mode '{mode}' (use 'ema' or 'window')")
+        self.mode = mode
+        self.alpha = alpha
+        self.time_constant = time_constant
+        self.window = max(1, window)
+        self.switch_margin = switch_margin
+        self.switch_frames = max(1, switch_frames)
+        self.labels = tuple(labels)
+        self._index = {label: i for i, label in enumerate(self.labels)}
+        self.reset()
+
+    def reset(self):
+        """Forget all history"""
+        self._scores: Optional[np.ndarray] = None
+        self._ring = np.zeros((self.window, len(self.labels)), dtype=np.float64)
+        self._ring_sum = np.zeros(len(self.labels), dtype=np.float64)
+        self._ring_count = 0
+        self._ring_pos = 0
+        self._last_time: Optional[float] = None
+        self._label: Optional[int] = None
+        self._challenger: Optional[int] = None
+        self._challenger_frames = 0
+        self.samples = 0
+
+    def _vector(self, scores) -> np.ndarray:
+        if isinstance(scores, dict):
+            vector = np.zeros(len(self.labels), dtype=np.float64)
+            for label, value in scores.items():
+                i = self._index.get(label)
+                if i is not None:
+                    vector[i] = value
+            return vector
+        return np.asarray(scores, dtype=np.float64)
+
+    def update(self, scores, timestamp: Optional[float] = None) -> Tuple[str, float]:
+        """Add one sample (dict or vector); returns the (label, score) to show"""
+        vector = self._vector(scores)
+        self.samples += 1
+
+        if self.mode == "window":
+            slot = self._ring[self._ring_pos]
+            self._ring_sum += vector - slot
+            slot[:] = vector
+            self._ring_pos = (self._ring_pos + 1) % self.window
+            self._ring_count = min(self._ring_count + 1, self.window)
+            self._scores = self._ring_sum / self._ring_count
+        else:
+            now = time.monotonic() if timestamp is None else timestamp
+            if self._scores is None:
+                self._scores = vector.copy()
+            else:
+                alpha = self.alpha
+                if self.time_constant and self._last_time is not None:
+                    elapsed = max(now - self._last_time, 0.0)
+                    alpha = 1.0 - math.exp(-elapsed / self.time_constant)
+                self._scores += alpha * (vector - self._scores)
+            self._last_time = now
+
+        self._apply_hysteresis()
+        return self.label, self.confidence
+
+    def _apply_hysteresis(self):
+        leader = int(np.argmax(self._scores))
+        if self._label is None or leader == self._label:
+            self._label = leader
+            self._challenger, self._challenger_frames = None, 0
+            return
+        if self._scores[leader] - self._scores[self._label] < self.switch_margin:
+            self._challenger, self._challenger_frames = None, 0
+            return
+        if leader == self._challenger:
+            self._challenger_frames += 1
+        else:
+            self._challenger, self._challenger_frames = leader, 1
+        if self._challenger_frames >= self.switch_frames:
+            self._label = leader
+            self._challenger, self._challenger_frames = None, 0
+
+    @property
+    def label(self) -> Optional[str]:
+        return None if self._label is None else self.labels[self._label]
+
+    @property
+    def confidence(self) -> float:
+        return 0.0 if self._label is None else float(self._scores[self._label])
+
+    @property
+    def scores(self) -> Dict[str, float]:
+        """Smoothed scores by emotion label"""
+        if self._scores is None:
+            return {}
+        return {label: round(float(value), 2) for label, value in zip(self.labels, self._scores)}
+
+
+def _iou(a: Box, b: Box) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = min(ax + aw, bx + bw) - max(ax, bx)
+    h = min(ay + ah, by + bh) - max(ay, by)
+    if w <= 0 or h <= 0:
+        return 0.0
+    overlap = w * h
+    return overlap / float(aw * ah + bw * bh - overlap)
+
+
+class FaceSmoother:
+    """One ``EmotionSmoother`` per face, matched across frames by box overlap
+
+    Faces unmatched for more than ``max_missed`` updates are forgotten.
+    """
+
+    def __init__(self, min_iou: float = 0.3, max_missed: int = 5, **smoother_args):
+        self.min_iou = min_iou
+        self.max_missed = max_missed
+        self.smoother_args = smoother_args
+        self._lock = threading.Lock()
+        self._tracks: List[dict] = []
+
+    def reset(self):
+        with self._lock:
+            self._tracks = []
+
+    def update(self, result: List[dict], timestamp: Optional[float] = None) -> List[dict]:
+        """Smooth FER-style results; each face gets smoothed ``emotions`` plus
+        the hysteresis ``emotion`` and ``confidence``"""
+        with self._lock:
+            return self._update(result, timestamp)
+
+    def _update(self, result: List[dict], timestamp: Optional[float]) -> List[dict]:
+        unmatched = list(self._tracks)
+        smoothed = []
+        for face in result:
+            box = tuple(face['box'])
+            best, best_iou = None, self.min_iou
+            for track in unmatched:
+                overlap = _iou(box, track['box'])
+                if overlap >= best_iou:
+                    best, best_iou = track, overlap
+            if best is None:
+                best = {'smoother': EmotionSmoother(**self.smoother_args), 'missed': 0}
+                self._tracks.append(best)
+            else:
+                unmatched.remove(best)
+            best['box'] = box
+            best['missed'] = 0
+            emotion, confidence = best['smoother'].update(face['emotions'], timestamp)
+            smoothed.append({'box': face['box'], 'emotions': best['smoother'].scores,
+                             'emotion': emotion, 'confidence': confidence})
+
+        for track in unmatched:
+            track['missed'] += 1
+        self._tracks = [t for t in self._tracks if t['missed'] <= self.max_missed]
+        return smoothed
@@ -1,16 +1,18 @@
 import cv2
-from fer import FER
 import pyttsx3
 import random
 import sys
 from mood_logger import MoodLogger
+from face_tracker import FaceTracker
+from emotion_smoothing import EmotionSmoother
+from emotion_backends import get_backend
 from config import *
 
 # Initialize components
 engine = pyttsx3.init()
 engine.setProperty('rate', SPEECH_RATE)
 engine.setProperty('volume', SPEECH_VOLUME)
-logger = MoodLogger(HISTORY_FILE) if ENABLE_MOOD_HISTORY else None
+logger = MoodLogger(HISTORY_FILE, mmap_dir=HISTORY_MMAP_DIR) if ENABLE_MOOD_HISTORY else None
 
 # Enhanced motivations with more variety
 motivations = {
@@ -72,7 +74,10 @@ def speak(text):
 
 def detect_emotion_from_face():
     """Improved face detection with better error handling"""
-    detector = FER(mtcnn=True)
+    detector = get_backend(EMOTION_BACKEND, inference_width=INFERENCE_WIDTH)
+    if FACE_TRACKING_ENABLED:
+        detector = FaceTracker(detector, detect_interval=FACE_DETECT_INTERVAL,
+                               min_track_ratio=FACE_TRACK_MIN_RATIO)
     cap = cv2.VideoCapture(CAMERA_INDEX)
     
     if not cap.isOpened():
@@ -83,7 +88,10 @@ def detect_emotion_from_face():
     detected_emotion = "neutral"
     confidence = 0.0
     frame_count = 0
-    emotion_scores = {}
+    # Mean of the full score vectors over the scan, with label hysteresis
+    smoother = EmotionSmoother(mode="window", window=FRAME_CAPTURE_COUNT,
+                               switch_margin=EMOTION_SWITCH_MARGIN,
+                               switch_frames=EMOTION_SWITCH_FRAMES)
 
     try:
         while frame_count < FRAME_CAPTURE_COUNT:
@@ -91,18 +99,9 @@ def detect_emotion_from_face():
             if not ret:
                 break
             
-            emotion_result = detector.top_emotion(frame)
-            if emotion_result:
-                emotion, score = emotion_result
-                
-                # Accumulate scores for averaging
-                if emotion not in emotion_scores:
-                    emotion_scores[emotion] = []
-                emotion_scores[emotion].append(score)
-                
-                if score > confidence:
-                    detected_emotion = emotion
-                    confidence = score
+            result = detector.detect_emotions(frame)
+            if result:
+                detected_emotion, confidence = smoother.update(result[0]['emotions'])
 
             # Enhanced visual feedback
             cv2.putText(frame, "Scanning... Press 'q' to quit", 
@@ -119,11 +118,6 @@ def detect_emotion_from_face():
         cap.release()
         cv2.destroyAllWindows()
         
-        # Calculate average confidence for detected emotion
-        if detected_emotion in emotion_scores:
-            avg_confidence = sum(emotion_scores[detected_emotion]) / len(emotion_scores[detected_emotion])
-            return detected_emotion, avg_confidence
-        
         return detected_emotion, confidence
         
     except Exception as e:
@@ -0,0 +1,181 @@
+"""Detect-then-track face localisation for cheaper per-frame emotion detection"""
+
+import threading
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+Box = Tuple[int, int, int, int]
+
+
+class _TrackState:
+    """Faces followed by one inference worker"""
+
+    def __init__(self, generation: int):
+        self.generation = generation
+        self.prev_gray: Optional[np.ndarray] = None
+        self.boxes: List[Box] = []
+        self.points: List[np.ndarray] = []
+        self.seeded: List[int] = []
+        self.frames_since_detect = 0
+
+
+def top_emotion(result: list) -> Optional[Tuple[str, float]]:
+    """Return (emotion, score) of the first face in a detection result"""
+    if not result:
+        return None
+    emotions = result[0]['emotions']
+    emotion = max(emotions, key=emotions.get)
+    return emotion, emotions[emotion]
+
+
+class FaceTracker:
+    """Runs full face detection only on keyframes and tracks boxes in between
+
+    Every ``detect_interval`` frames (or as soon as tracking gets unreliable)
+    the wrapped FER detector runs its full face detection. On the frames in
+    between, the face boxes are moved with Lucas-Kanade optical flow on a
+    handful of corner points inside each box, and only the emotion
+    classifier runs on the tracked boxes. A box too small or too flat to
+    seed enough points is kept where it was detected until the next
+    keyframe.
+
+    Every calling thread tracks its own faces, so parallel inference
+    workers don't wait on each other. Each worker gets its frames in
+    capture order, so optical flow never runs backwards, but a worker only
+    sees every N-th frame of N workers.
+    """
+
+    def __init__(self, detector, detect_interval: int = 10,
+                 min_track_ratio: float = 0.5, max_points: int = 40):
+        self.detector = detector
+        self.detect_interval = max(1, detect_interval)
+        self.min_track_ratio = min_track_ratio
+        self.max_points = max_points
+
+        self._local = threading.local()
+        # Bumped by reset() so every thread drops its tracked faces
+        self._generation = 0
+        self._stats_lock = threading.Lock()
+
+        self.detections = 0
+        self.tracked_frames = 0
+
+    def reset(self):
+        """Forget tracked faces so the next frame runs full detection"""
+        self._generation += 1
+
+    def _state(self) -> _TrackState:
+        state = getattr(self._local, "state", None)
+        if state is None or state.generation != self._generation:
+            state = self._local.state = _TrackState(self._generation)
+        return state
+
+    def detect_emotions(self, frame: np.ndarray, inference_width: Optional[int] = None) -> list:
+        """Drop-in replacement for ``FER.detect_emotions`` using tracking
+
+        ``inference_width`` is passed on to the detector for keyframes.
+        """
+        state = self._state()
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        boxes = None
+        if state.boxes and state.frames_since_detect < self.detect_interval:
+            boxes = self._track(state, gray)
+
+        if boxes is None:
+            if inference_width:
+                result = self.detector.detect_emotions(frame, inference_width=inference_width)
+            else:
+                result = self.detector.detect_emotions(frame)
+            self._seed(state, [tuple(face['box']) for face in result], gray)
+            state.frames_since_detect = 1
+            with self._stats_lock:
+                self.detections += 1
+        else:
+            result = self.detector.detect_emotions(frame, face_rectangles=boxes)
+            state.frames_since_detect += 1
+            with self._stats_lock:
+                self.tracked_frames += 1
+
+        state.prev_gray = gray
+        return result
+
+    def _seed(self, state: _TrackState, boxes: List[Box], gray: np.ndarray):
+        """Pick trackable corner points inside each detected box"""
+        state.boxes = []
+        state.points = []
+        state.seeded = []
+        frame_h, frame_w = gray.shape[:2]
+        for box in boxes:
+            x, y, w, h = (int(v) for v in box)
+            x0, y0 = max(0, x), max(0, y)
+            x1, y1 = min(frame_w, x + w), min(frame_h, y + h)
+            points = None
+            if x1 - x0 >= 8 and y1 - y0 >= 8:
+                points = cv2.goodFeaturesToTrack(gray[y0:y1, x0:x1],
+                                                 maxCorners=self.max_points,
+                                                 qualityLevel=0.01,
+                                                 minDistance=5,
+                                                 blockSize=3)
+            if points is None or len(points) < 4:
+                # Nothing to track: keep the detected box as it is
+                points = np.empty((0, 2), dtype=np.float32)
+            else:
+                points = points.reshape(-1, 2) + np.array([x0, y0], dtype=np.float32)
+            state.boxes.append((x, y, w, h))
+            state.points.append(points)
+            state.seeded.append(len(points))
+
+    def _track(self, state: _TrackState, gray: np.ndarray) -> Optional[List[Box]]:
+        """Move every box with optical flow, or None if any face was lost
+
+        Boxes without points (see ``_seed``) stay where they are.
+        """
+        if state.prev_gray is None or state.prev_gray.shape != gray.shape:
+            return None
+
+        counts = [len(p) for p in state.points]
+        prev_pts = np.concatenate(state.points).reshape(-1, 2)
+        curr_pts = prev_pts
+        status = np.ones(len(prev_pts), dtype=bool)
+        if len(prev_pts):
+            curr_pts, status, _ = cv2.calcOpticalFlowPyrLK(
+                state.prev_gray, gray, prev_pts.reshape(-1, 1, 2), None)
+            if curr_pts is None:
+                return None
+            status = status.reshape(-1).astype(bool)
+            curr_pts = curr_pts.reshape(-1, 2)
+
+        boxes, points = [], []
+        start = 0
+        for box, count, seeded in zip(state.boxes, counts, state.seeded):
+            if not seeded:
+                boxes.append(box)
+                points.append(prev_pts[:0])
+                continue
+            ok = status[start:start + count]
+            old = prev_pts[start:start + count][ok]
+            new = curr_pts[start:start + count][ok]
+            start += count
+
+            # Too many points lost: confidence has dropped, re-detect
+            if len(new) < max(4, self.min_track_ratio * seeded):
+                return None
+
+            dx, dy = np.median(new - old, axis=0)
+            old_spread = np.median(np.linalg.norm(old - old.mean(axis=0), axis=1))
+            new_spread = np.median(np.linalg.norm(new - new.mean(axis=0), axis=1))
+            scale = new_spread / old_spread if old_spread > 0 else 1.0
+
+            x, y, w, h = box
+            cx, cy = x + w / 2 + dx, y + h / 2 + dy
+            w, h = w * scale, h * scale
+            boxes.append((int(round(cx - w / 2)), int(round(cy - h / 2)),
+                          int(round(w)), int(round(h))))
+            points.append(new)
+
+        state.boxes = boxes
+        state.points = points
+        return boxes
@@ -0,0 +1,419 @@
+"""Pipelined video processing: capture, inference and encoding as separate stages"""
+
+import itertools
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from stream_encoder import same_image
+
+# Frame ids keep growing across pipeline restarts, so clients can match
+# frames and overlay metadata without mixing up camera sessions
+_frame_ids = itertools.count()
+
+
+@dataclass
+class Frame:
+    """A captured frame travelling through the pipeline"""
+    frame_id: int
+    captured_at: float
+    image: np.ndarray
+
+
+@dataclass
+class EncodedFrame:
+    """An encoded frame on its way to the stream clients
+
+    ``result_id`` is the frame id of the inference result current when the
+    frame was encoded (-1 before the first one).
+    """
+    frame_id: int
+    captured_at: float
+    payload: bytes
+    result_id: int = -1
+
+
+def encode_jpeg(image: np.ndarray) -> Optional[bytes]:
+    """Encode a BGR frame as JPEG bytes"""
+    ok, buffer = cv2.imencode('.jpg', image)
+    return buffer.tobytes() if ok else None
+
+
+class DropQueue:
+    """Bounded queue whose producer never blocks
+
+    When the queue is full either the oldest item is discarded
+    (``drop_oldest=True``) or the incoming item is rejected, so the
+    latency added by queueing can never grow past ``maxsize`` items.
+    ``on_drop`` is called (under the queue lock) for every dropped item.
+    """
+
+    def __init__(self, maxsize: int = 2, drop_oldest: bool = True,
+                 on_drop: Optional[Callable[[], None]] = None):
+        self.maxsize = max(1, maxsize)
+        self.drop_oldest = drop_oldest
+        self.on_drop = on_drop
+        self.dropped = 0
+        self._items: Deque[Any] = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, item: Any) -> bool:
+        """Queue an item, returns False if it was rejected"""
+        with self._cond:
+            if self._closed:
+                return False
+            if len(self._items) >= self.maxsize:
+                self.dropped += 1
+                if self.on_drop is not None:
+                    self.on_drop()
+                if not self.drop_oldest:
+                    return False
+                self._items.popleft()
+            self._items.append(item)
+            self._cond.notify()
+            return True
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Any]:
+        """Take the next item, or None on timeout / once closed and drained"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._items or self._closed, timeout)
+            if self._items:
+                return self._items.popleft()
+            return None
+
+    def close(self):
+        """Wake up all waiting consumers and refuse further items"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class FramePipeline:
+    """Runs capture, emotion inference and JPEG encoding in separate threads
+
+    The capture thread feeds both the inference workers and the encoder
+    through drop queues. The encoder annotates every captured frame with the
+    most recent completed inference result, so the stream keeps flowing at
+    camera rate no matter how slow the emotion model is.
+
+    An optional ``scheduler`` (see ``adaptive_scheduler``) receives per-stage
+    timings and decides which frames go to inference. Optional ``metrics``
+    (see ``pipeline_metrics``) record stage timings, latencies and drops.
+    With ``skip_unchanged`` a frame identical to the previous one, with no
+    new inference result, reuses the previous encoded payload.
+
+    Without ``annotate`` frames are streamed clean; ``on_result(frame,
+    result)`` is called for every inference result newer than the last, so
+    the caller can publish it for clients to draw themselves.
+
+    An exception raised by ``infer`` is counted (``inference_errors``,
+    ``last_inference_error`` and the ``inference`` error metric) and the
+    frame is skipped; the worker keeps going with the next frame.
+    """
+
+    def __init__(self, open_camera: Callable[[], Any],
+                 infer: Callable[[np.ndarray], Any],
+                 annotate: Optional[Callable[[np.ndarray, Any], np.ndarray]],
+                 preprocess: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+                 encode: Callable[[np.ndarray], Optional[bytes]] = encode_jpeg,
+                 inference_workers: int = 1,
+                 queue_size: int = 2,
+                 drop_oldest: bool = True,
+                 scheduler: Optional[Any] = None,
+                 metrics: Optional[Any] = None,
+                 skip_unchanged: bool = False,
+                 on_result: Optional[Callable[[Frame, Any], None]] = None):
+        self._open_camera = open_camera
+        self._infer = infer
+        self._annotate = annotate
+        self._preprocess = preprocess
+        self._encode = encode
+        self.inference_workers = max(1, inference_workers)
+        self.scheduler = scheduler
+        self.metrics = metrics
+        self.skip_unchanged = skip_unchanged
+        self._on_result = on_result
+
+        self.inference_queue = DropQueue(queue_size, drop_oldest, self._drop_counter("inference"))
+        self.encode_queue = DropQueue(queue_size, drop_oldest, self._drop_counter("encode"))
+        self.output_queue = DropQueue(queue_size, drop_oldest, self._drop_counter("output"))
+
+        self._result_lock = threading.Lock()
+        self._latest_result = None
+        self._latest_result_id = -1
+
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+        self.frames_captured = 0
+        self.frames_inferred = 0
+        self.frames_encoded = 0
+        self.inference_errors = 0
+        self.last_inference_error: Optional[str] = None
+
+    def _drop_counter(self, queue_name: str) -> Optional[Callable[[], None]]:
+        if self.metrics is None:
+            return None
+        return lambda: self.metrics.dropped(queue_name)
+
+    def start(self) -> "FramePipeline":
+        """Start all stage threads (no-op if already running)"""
+        if self._threads:
+            return self
+        self._stop.clear()
+        self._threads.append(threading.Thread(
+            target=self._capture_loop, name="pipeline-capture", daemon=True))
+        for i in range(self.inference_workers):
+            self._threads.append(threading.Thread(
+                target=self._inference_loop, name=f"pipeline-infer-{i}", daemon=True))
+        self._threads.append(threading.Thread(
+            target=self._encode_loop, name="pipeline-encode", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout: float = 2.0):
+        """Signal all stages to finish and wait for them"""
+        self._stop.set()
+        for q in (self.inference_queue, self.encode_queue, self.output_queue):
+            q.close()
+        current = threading.current_thread()
+        for thread in self._threads:
+            if thread is not current:
+                thread.join(timeout)
+        self._threads = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._threads) and not self._stop.is_set()
+
+    def latest(self) -> Tuple[int, Any]:
+        """``(frame_id, result)`` of the most recent completed inference"""
+        with self._result_lock:
+            return self._latest_result_id, self._latest_result
+
+    def _capture_loop(self):
+        camera = self._open_camera()
+        try:
+            previous_capture = None
+            metrics = self.metrics
+            while not self._stop.is_set():
+                started = time.time()
+                success, image = camera.read()
+                if not success:
+                    break
+                captured_at = time.time()
+                if metrics is not None:
+                    metrics.stage("capture", captured_at - started)
+                    metrics.frame("captured")
+                if self.scheduler is not None and previous_capture is not None:
+                    self.scheduler.record("capture_interval", captured_at - previous_capture)
+                previous_capture = captured_at
+                if self._preprocess is not None:
+                    image = self._preprocess(image)
+                    preprocessed = time.time() - captured_at
+                    if self.scheduler is not None:
+                        self.scheduler.record("preprocess", preprocessed)
+                    if metrics is not None:
+                        metrics.stage("preprocess", preprocessed)
+                frame_id = next(_frame_ids)
+                frame = Frame(frame_id, captured_at, image)
+                if self.scheduler is None or self.scheduler.should_infer(frame_id):
+                    self.inference_queue.put(frame)
+                elif metrics is not None:
+                    metrics.frame("skipped")
+                self.encode_queue.put(frame)
+                self.frames_captured += 1
+        finally:
+            camera.release()
+            self._stop.set()
+            self.inference_queue.close()
+            self.encode_queue.close()
+
+    def _inference_loop(self):
+        while True:
+            frame = self.inference_queue.get(timeout=0.5)
+            if frame is None:
+                if self.inference_queue.closed:
+                    break
+                continue
+            started = time.time()
+            try:
+                result = self._infer(frame.image)
+            except Exception as e:
+                # A failing model or an odd crop must not kill the worker
+                error = f"{type(e).__name__}: {e}"
+                if error != self.last_inference_error:
+                    print(f"⚠️ Inference error on frame {frame.frame_id}: {error}")
+                self.inference_errors += 1
+                self.last_inference_error = error
+                if self.metrics is not None:
+                    self.metrics.error("inference")
+                continue
+            finished = time.time()
+            if self.scheduler is not None:
+                self.scheduler.record("inference", finished - started)
+                self.scheduler.record("inference_latency", finished - frame.captured_at)
+            if self.metrics is not None:
+                self.metrics.stage("inference", finished - started)
+                self.metrics.latency("inference", finished - frame.captured_at)
+                self.metrics.frame("inferred")
+            with self._result_lock:
+                # Workers may finish out of order; never go back in time
+                newer = frame.frame_id > self._latest_result_id
+                if newer:
+                    self._latest_result = result
+                    self._latest_result_id = frame.frame_id
+            if newer and self._on_result is not None:
+                self._on_result(frame, result)
+            self.frames_inferred += 1
+
+    def _encode_loop(self):
+        last_image = last_result = last_payload = None
+        try:
+            while True:
+                frame = self.encode_queue.get(timeout=0.5)
+                if frame is None:
+                    if self.encode_queue.closed:
+                        break
+                    continue
+                started = time.time()
+                image = frame.image
+                result_id, result = self.latest()
+                overlay_changed = self._annotate is not None and result is not last_result
+                if (self.skip_unchanged and last_payload is not None
+                        and not overlay_changed and same_image(image, last_image)):
+                    # Same pixels and overlay as the previous frame: same JPEG
+                    payload = last_payload
+                    finished = time.time()
+                    if self.metrics is not None:
+                        self.metrics.frame("unchanged")
+                else:
+                    if result and self._annotate is not None:
+                        # The inference workers may still be reading this frame
+                        image = self._annotate(image.copy(), result)
+                    annotated = time.time()
+                    payload = self._encode(image)
+                    finished = time.time()
+                    last_image, last_result, last_payload = frame.image, result, payload
+                    if self.metrics is not None:
+                        if result and self._annotate is not None:
+                            self.metrics.stage("annotate", annotated - started)
+                        self.metrics.stage("encode", finished - annotated)
+                if self.scheduler is not None:
+                    self.scheduler.record("encode", finished - started)
+                    self.scheduler.record("frame_latency", finished - frame.captured_at)
+                if self.metrics is not None:
+                    self.metrics.latency("encode", finished - frame.captured_at)
+                if payload is not None:
+                    self.output_queue.put(EncodedFrame(frame.frame_id, frame.captured_at,
+                                                       payload, result_id))
+                    self.frames_encoded += 1
+                    if self.metrics is not None:
+                        self.metrics.frame("encoded")
+        finally:
+            self.output_queue.close()
+
+
+class FrameHub:
+    """Shares one pipeline (one camera, one inference loop) between clients
+
+    The hub starts the pipeline when the first subscriber arrives and stops
+    it when the last one leaves. Encoded frames are fanned out to a small
+    drop queue per subscriber, so a slow client skips frames instead of
+    stalling the producer or the other clients. With ``metrics`` the hub
+    records capture-to-send latency and frames dropped for slow clients.
+    """
+
+    def __init__(self, pipeline_factory: Callable[[], FramePipeline],
+                 subscriber_queue_size: int = 1, metrics: Optional[Any] = None):
+        self._pipeline_factory = pipeline_factory
+        self.subscriber_queue_size = subscriber_queue_size
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._subscribers: List[DropQueue] = []
+        self._pipeline: Optional[FramePipeline] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    @property
+    def pipeline(self) -> Optional[FramePipeline]:
+        return self._pipeline
+
+    def subscribe(self) -> DropQueue:
+        """Register a new client, starting the pipeline if needed"""
+        on_drop = (lambda: self.metrics.dropped("subscriber")) if self.metrics is not None else None
+        subscriber = DropQueue(self.subscriber_queue_size, drop_oldest=True, on_drop=on_drop)
+        with self._lock:
+            self._subscribers.append(subscriber)
+            if self._pipeline is None:
+                self._pipeline = self._pipeline_factory().start()
+                threading.Thread(target=self._broadcast_loop, args=(self._pipeline,),
+                                 name="hub-broadcast", daemon=True).start()
+        return subscriber
+
+    def unsubscribe(self, subscriber: DropQueue):
+        """Remove a client, stopping the pipeline when none are left"""
+        subscriber.close()
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+            if not self._subscribers and self._pipeline is not None:
+                # Stopped under the lock so a new subscriber can't reopen the
+                # camera before the old capture thread has released it
+                self._pipeline.stop()
+                self._pipeline = None
+
+    def frames(self) -> Iterator[EncodedFrame]:
+        """Yield shared encoded frames, with frame and result ids, for one client"""
+        subscriber = self.subscribe()
+        try:
+            while True:
+                encoded = subscriber.get(timeout=1.0)
+                if encoded is None:
+                    if subscriber.closed:
+                        break
+                    continue
+                yield encoded
+                # Resumed once the server has written the frame to the client
+                if self.metrics is not None:
+                    self.metrics.latency("send", time.time() - encoded.captured_at)
+                    self.metrics.frame("sent")
+        finally:
+            self.unsubscribe(subscriber)
+
+    def _broadcast_loop(self, pipeline: FramePipeline):
+        while True:
+            encoded = pipeline.output_queue.get(timeout=1.0)
+            if encoded is None:
+                if pipeline.output_queue.closed:
+                    break
+                continue
+            with self._lock:
+                subscribers = list(self._subscribers)
+            for subscriber in subscribers:
+                subscriber.put(encoded)
+
+        # The camera stopped on its own: end every client stream
+        with self._lock:
+            if self._pipeline is pipeline:
+                for subscriber in self._subscribers:
+                    subscriber.close()
+                self._subscribers = []
+                self._pipeline = None
@@ -0,0 +1,199 @@
+"""Compiled keyword lexicon for matching feelings in transcribed speech
+
+The lexicon is built once from the keyword/feeling tables used by the apps
+and then matches text with plain dictionary lookups:
+
+- multi-word phrases ("fed up") through a token trie, longest match first
+- regular inflections of each keyword, so "crying", "cried" and "cries" all
+  hit "cry" (generated from the keywords, never by stripping the input, so
+  "tires" doesn't hit "tired")
+- negation ("not happy", "never angry") within a short window before a
+  match and in the same clause: punctuation, "but", "however" and "though"
+  end its scope. Text whose only matches are negated can be given its own
+  result (e.g. "neutral") instead of falling back to sentiment polarity
+- weighted scores summed over every match instead of first-hit-wins
+"""
+
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+TOKEN_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?|[.,;:!?]")
+
+NEGATIONS = frozenset([
+    "not", "no", "never", "neither", "nor", "none", "nothing", "hardly",
+    "barely", "without", "cannot", "can't", "don't", "doesn't", "didn't",
+    "isn't", "wasn't", "aren't", "weren't", "won't", "wouldn't", "shouldn't",
+    "couldn't", "haven't", "hasn't", "hadn't", "ain't", "dont", "cant",
+    "isnt", "wasnt", "arent", "didnt", "doesnt", "wont",
+])
+NEGATION_WINDOW = 3
+# Tokens that end a clause, and with it the scope of a negation
+CLAUSE_BREAKS = frozenset([".", ",", ";", ":", "!", "?",
+                           "but", "however", "though", "although"])
+
+_VOWELS = frozenset("aeiou")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, keeping contractions such as "don't" intact
+
+    Clause punctuation (``.,;:!?``) is kept as separate tokens.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def inflections(word: str) -> Iterator[str]:
+    """Regular inflected forms of a keyword (not including the word itself)
+
+    A keyword ending in "ed" is taken as a participle adjective and only
+    gets "-ing", "-ly" and "-ness" forms ("tired" -> "tiring", "tiredness"),
+    never its bare verb forms ("tire", "tires"), which often mean something
+    else. Other keywords get the usual noun, verb and adjective suffixes
+    with "e" dropping, "y" -> "i" and doubled final consonants ("sad" ->
+    "sadder").
+    """
+    if word.endswith("ed") and len(word) > 4:
+        stem = word[:-3] + "y" if word.endswith("ied") else word[:-2]
+        yield stem + "ing"
+        yield word + "ly"
+        yield word + "ness"
+        return
+
+    if word.endswith("y") and len(word) > 2 and word[-2] not in _VOWELS:
+        stem = word[:-1] + "i"
+        for suffix in ("es", "ed", "er", "est", "ly", "ness"):
+            yield stem + suffix
+        yield word + "ing"
+        return
+
+    if word.endswith("e"):
+        for suffix in ("s", "d", "r", "st", "ly", "ness"):
+            yield word + suffix
+        yield word[:-1] + "ing"
+        return
+
+    stems = [word]
+    if (len(word) <= 4 and word[-1] not in _VOWELS and word[-1] not in "wxy"
+            and word[-2] in _VOWELS and (len(word) < 3 or word[-3] not in _VOWELS)):
+        # Short consonant-vowel-consonant words double the last letter
+        stems.append(word + word[-1])
+    yield word + ("es" if word.endswith(("s", "x", "z", "ch", "sh")) else "s")
+    yield word + "ly"
+    yield word + "ness"
+    for stem in stems:
+        for suffix in ("ed", "ing", "er", "est"):
+            yield stem + suffix
+
+
+class MoodLexicon:
+    """Keyword/phrase -> feeling index with negation and inflections
+
+    ``entries`` are ``(keyword, feeling, weight)`` tuples; keywords may be
+    phrases of several words. A keyword listed explicitly always wins over
+    an inflection of another keyword.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str, float]]):
+        self._words: Dict[str, Tuple[str, float]] = {}
+        self._derived: Dict[str, Tuple[str, float]] = {}
+        self._phrases: Dict[str, dict] = {}
+        self.feelings: List[str] = []
+
+        for keyword, feeling, weight in entries:
+            if feeling not in self.feelings:
+                self.feelings.append(feeling)
+            tokens = tokenize(keyword)
+            if len(tokens) == 1:
+                word = tokens[0]
+                self._words.setdefault(word, (feeling, weight))
+                for form in inflections(word):
+                    self._derived.setdefault(form, (feeling, weight))
+            elif tokens:
+                node = self._phrases
+                for token in tokens:
+                    node = node.setdefault(token, {})
+                node.setdefault(None, (feeling, weight))
+
+    @classmethod
+    def from_columns(cls, data: Dict[str, Sequence], weight: float = 1.0) -> "MoodLexicon":
+        """Build from ``{"keyword": [...], "feeling": [...]}`` style tables"""
+        weights = data.get("weight", [weight] * len(data["keyword"]))
+        return cls(zip(data["keyword"], data["feeling"], weights))
+
+    def lookup(self, word: str) -> Optional[Tuple[str, float]]:
+        """Feeling and weight for a keyword or one of its inflections"""
+        hit = self._words.get(word)
+        if hit is not None:
+            return hit
+        return self._derived.get(word)
+
+    def find_matches(self, tokens: Sequence[str]) -> List[Tuple[int, str, float, bool]]:
+        """All matches as ``(position, feeling, weight, negated)``"""
+        matches = []
+        last_negation = -NEGATION_WINDOW - 1
+        i = 0
+        n = len(tokens)
+        while i < n:
+            token = tokens[i]
+            if token in CLAUSE_BREAKS:
+                last_negation = -NEGATION_WINDOW - 1
+                i += 1
+                continue
+            if token in NEGATIONS:
+                last_negation = i
+                i += 1
+                continue
+
+            # Longest phrase starting here
+            hit, length = None, 1
+            node = self._phrases.get(token)
+            j = i + 1
+            while node is not None:
+                if None in node:
+                    hit, length = node[None], j - i
+                if j >= n:
+                    break
+                node = node.get(tokens[j])
+                j += 1
+
+            if hit is None:
+                hit = self.lookup(token)
+            if hit is not None:
+                negated = i - last_negation <= NEGATION_WINDOW
+                matches.append((i, hit[0], hit[1], negated))
+            i += length
+        return matches
+
+    def score_tokens(self, tokens: Sequence[str]) -> Dict[str, float]:
+        """Summed weight per feeling; negated matches count against it"""
+        scores: Dict[str, float] = {}
+        for _, feeling, weight, negated in self.find_matches(tokens):
+            scores[feeling] = scores.get(feeling, 0.0) + (-weight if negated else weight)
+        return scores
+
+    def match_tokens(self, tokens: Sequence[str], negated: Optional[str] = None) -> Optional[str]:
+        """Best-scoring feeling, or None if nothing positive matched
+
+        A tie between feelings ("I love it but I hate it") is ambiguous and
+        also gives None, so callers fall back to sentiment polarity. When
+        every match is negated ("I am not at all happy") ``negated`` is
+        returned instead: sentiment polarity would ignore the negation.
+        """
+        best, best_score, tied = None, 0.0, False
+        scores = self.score_tokens(tokens)
+        for feeling, value in scores.items():
+            if value > best_score:
+                best, best_score, tied = feeling, value, False
+            elif value == best_score and best is not None:
+                tied = True
+        if best is None and scores and all(value < 0 for value in scores.values()):
+            return negated
+        return None if tied else best
+
+    def score(self, text: str) -> Dict[str, float]:
+        """Summed weight per feeling in a text"""
+        return self.score_tokens(tokenize(text))
+
+    def match(self, text: str, negated: Optional[str] = None) -> Optional[str]:
+        """Best-scoring feeling in a text, or None (see ``match_tokens``)"""
+        return self.match_tokens(tokenize(text), negated)
@@ -1,7 +1,10 @@
 import cv2
-from fer import FER
 import pyttsx3
 import random
+from face_tracker import FaceTracker, top_emotion
+from emotion_backends import get_backend
+from config import (FACE_TRACKING_ENABLED, FACE_DETECT_INTERVAL, FACE_TRACK_MIN_RATIO,
+                    INFERENCE_WIDTH, EMOTION_BACKEND)
 
 # Initialize speech engine
 engine = pyttsx3.init()
@@ -47,7 +50,10 @@ def speak(text):
     engine.runAndWait()
 
 def detect_emotion_from_face():
-    detector = FER(mtcnn=True)
+    detector = get_backend(EMOTION_BACKEND, inference_width=INFERENCE_WIDTH)
+    if FACE_TRACKING_ENABLED:
+        detector = FaceTracker(detector, detect_interval=FACE_DETECT_INTERVAL,
+                               min_track_ratio=FACE_TRACK_MIN_RATIO)
     cap = cv2.VideoCapture(0)
 
     speak("Scanning your face. Please look at the camera.")
@@ -59,7 +65,7 @@ def detect_emotion_from_face():
             ret, frame = cap.read()
             if not ret:
                 break
-            emotion_result = detector.top_emotion(frame)
+            emotion_result = top_emotion(detector.detect_emotions(frame))
             if emotion_result:
                 emotion, score = emotion_result
                 if score > confidence:
@@ -0,0 +1,82 @@
+"""Background loading of heavy models so the apps can start serving immediately"""
+
+import threading
+import time
+from typing import Any, Callable, Optional
+
+IDLE = "idle"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class ModelLoader:
+    """Builds an expensive object (e.g. an emotion backend) in a background thread
+
+    ``get()`` never blocks longer than asked, so callers on a hot path can
+    simply skip work until the model is ready. ``status()`` reports the
+    readiness state for clients.
+    """
+
+    def __init__(self, factory: Callable[[], Any], name: str = "model"):
+        self._factory = factory
+        self.name = name
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._state = IDLE
+        self._value = None
+        self._error: Optional[str] = None
+        self._started_at: Optional[float] = None
+        self._load_seconds: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    @property
+    def ready(self) -> bool:
+        return self._state == READY
+
+    def start(self) -> "ModelLoader":
+        """Begin loading in the background (no-op if already started)"""
+        with self._lock:
+            if self._state != IDLE:
+                return self
+            self._state = LOADING
+            self._started_at = time.time()
+        threading.Thread(target=self._load, name=f"load-{self.name}", daemon=True).start()
+        return self
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """Return the loaded object, or None if it isn't ready within ``timeout``
+
+        Starts loading on first use. ``timeout=None`` waits until loading
+        finishes; ``timeout=0`` never waits.
+        """
+        if self._state == READY:
+            return self._value
+        self.start()
+        self._done.wait(timeout)
+        return self._value if self._state == READY else None
+
+    def status(self) -> dict:
+        """Readiness information suitable for a JSON response"""
+        return {
+            'name': self.name,
+            'state': self._state,
+            'error': self._error,
+            'load_seconds': round(self._load_seconds, 2) if self._load_seconds is not None else None
+        }
+
+    def _load(self):
+        try:
+            value = self._factory()
+        except Exception as e:
+            self._error = f"{type(e).__name__}: {e}"
+            self._state = FAILED
+        else:
+            self._value = value
+            self._state = READY
+        finally:
+            self._load_seconds = time.time() - self._started_at
+            self._done.set()
@@ -1,7 +1,7 @@
 # =============================================================================
 # INSTALLATION COMMAND for Python 3.10:
 # Run this in your terminal (with your .venv activated)
-# pip install opencv-python fer deepface moviepy pyttsx3 textblob pandas speechrecognition pyaudio
+# pip install opencv-python fer deepface moviepy pyttsx3 textblob speechrecognition pyaudio
 #
 # If PyAudio fails, try:
 # pip install pipwin
@@ -13,14 +13,14 @@
 # =============================================================================
 
 import speech_recognition as sr
-from textblob import TextBlob
-import pandas as pd
 import pyttsx3
+from lexicon import MoodLexicon
+from text_mood import TextMoodAnalyzer
 import random
 import cv2
-from fer import FER
 import time
-from deepface import DeepFace
+from config import EMOTION_BACKEND
+from emotion_backends import get_backend
 
 # Initialize TTS engine
 engine = pyttsx3.init()
@@ -42,7 +42,8 @@ data = {
         "Anxious", "Anxious"
     ]
 }
-dataset = pd.DataFrame(data)
+lexicon = MoodLexicon.from_columns(data)
+text_analyzer = TextMoodAnalyzer(lexicon, labels=("Happy", "Sad", "Neutral"))
 
 # Motivational messages by mood
 motivations = {
@@ -115,36 +116,22 @@ def speak(text):
     engine.runAndWait()
 
 
-# Match feeling from dataset
+# Match feeling from the keyword lexicon
 def match_feeling(text):
-    words = text.lower().split()
-    for word in words:
-        match = dataset[dataset['keyword'] == word]
-        if not match.empty:
-            return match.iloc[0]['feeling']
-    return None
-
+    return lexicon.match(text)
 
 # Analyze mood from text
 def analyze_mood(text):
-    feeling = match_feeling(text)
-    if feeling:
-        return feeling
-    blob = TextBlob(text)
-    polarity = blob.sentiment.polarity
-    if polarity > 0.3:
-        return "Happy"
-    elif polarity < -0.3:
-        return "Sad"
-    else:
-        return "Neutral"
+    return text_analyzer.analyze(text)[0]
 
 
-# Analyze mood from facial expression
-def analyze_facial_mood():
-    # Initialize the FER detector
-    detector = FER(mtcnn=True)
+# Analyze many transcripts at once, returning (moods, confidences) arrays
+def analyze_many(texts, exact=False):
+    return text_analyzer.analyze_many(texts, exact=exact)
 
+
+# Analyze mood from facial expression
+def analyze_facial_mood(backend=EMOTION_BACKEND):
     # Initialize webcam
     cap = cv2.VideoCapture(0)
 
@@ -158,24 +145,27 @@ def analyze_facial_mood():
     # Capture a single frame
     ret, frame = cap.read()
 
+    cap.release()
+    cv2.destroyAllWindows()
+
     if not ret:
         speak("Sorry, I couldn't capture an image.")
-        cap.release()
         return None
 
-    # Detect emotions
-    result = detector.detect_emotions(frame)
-
-    cap.release()
-    cv2.destroyAllWindows()
+    try:
+        # Detect emotions with the chosen backend
+        result = get_backend(backend).analyze(frame)
+    except Exception:
+        speak("I had trouble analyzing your facial expression.")
+        return None
 
     if not result:
         speak("I couldn't detect a face. Let's try another method.")
         return None
 
     # Get the dominant emotion
-    dominant_emotion = max(result[0]['emotions'], key=result[0]['emotions'].get)
-    confidence = result[0]['emotions'][dominant_emotion]
+    dominant_emotion = result[0].emotion
+    confidence = result[0].confidence
 
     # Format the emotion name to match our dataset
     emotion_map = {
@@ -196,52 +186,7 @@ def analyze_facial_mood():
 
 # Alternative method using DeepFace for more robust detection
 def analyze_facial_mood_deepface():
-    # Initialize webcam
-    cap = cv2.VideoCapture(0)
-
-    if not cap.isOpened():
-        speak("Sorry, I couldn't access your camera.")
-        return None
-
-    speak("I'll analyze your facial expression. Get ready and look at the camera.")
-    time.sleep(2)
-
-    # Capture a single frame
-    ret, frame = cap.read()
-
-    if not ret:
-        speak("Sorry, I couldn't capture an image.")
-        cap.release()
-        return None
-
-    cap.release()
-    cv2.destroyAllWindows()
-
-    try:
-        # Analyze the image
-        result = DeepFace.analyze(frame, actions=['emotion'], enforce_detection=False)
-
-        # Get the dominant emotion
-        dominant_emotion = result[0]['dominant_emotion']
-
-        # Format the emotion name to match our dataset
-        emotion_map = {
-            'happy': 'Happy',
-            'sad': 'Sad',
-            'angry': 'Angry',
-            'fear': 'Fear',
-            'surprise': 'Surprised',
-            'neutral': 'Neutral',
-            'disgust': 'Disgust'
-        }
-
-        formatted_emotion = emotion_map.get(dominant_emotion, 'Neutral')
-
-        speak(f"I detected you're feeling {formatted_emotion}.")
-        return formatted_emotion
-    except Exception as e:
-        speak("I had trouble analyzing your facial expression.")
-        return None
+    return analyze_facial_mood(backend="deepface")
 
 
 # Suggest motivation, referral, and music
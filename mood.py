@@ -1,9 +1,7 @@
 import speech_recognition as sr
-from textblob import TextBlob
-import pandas as pd
-from textblob import TextBlob
-import speech_recognition as sr
 import pyttsx3
+from lexicon import MoodLexicon
+from text_mood import TextMoodAnalyzer
 import random
 
 # Initialize TTS engine
@@ -26,7 +24,8 @@ data = {
         "Anxious", "Anxious"
     ]
 }
-dataset = pd.DataFrame(data)
+lexicon = MoodLexicon.from_columns(data)
+text_analyzer = TextMoodAnalyzer(lexicon, labels=("Happy", "Sad", "Neutral"))
 
 # Motivational messages by mood
 motivations = {
@@ -82,28 +81,18 @@ def speak(text):
     engine.say(text)
     engine.runAndWait()
 
-# Match feeling from dataset
+# Match feeling from the keyword lexicon
 def match_feeling(text):
-    words = text.lower().split()
-    for word in words:
-        match = dataset[dataset['keyword'] == word]
-        if not match.empty:
-            return match.iloc[0]['feeling']
-    return None
+    return lexicon.match(text)
 
 # Analyze mood
 def analyze_mood(text):
-    feeling = match_feeling(text)
-    if feeling:
-        return feeling
-    blob = TextBlob(text)
-    polarity = blob.sentiment.polarity
-    if polarity > 0.3:
-        return "Happy"
-    elif polarity < -0.3:
-        return "Sad"
-    else:
-        return "Neutral"
+    return text_analyzer.analyze(text)[0]
+
+
+# Analyze many transcripts at once, returning (moods, confidences) arrays
+def analyze_many(texts, exact=False):
+    return text_analyzer.analyze_many(texts, exact=exact)
 
 # Suggest motivation, referral, and music
 def support_user(feeling):
@@ -1,59 +1,434 @@
+import atexit
 import json
 import os
-from datetime import datetime
-from typing import Dict, List, Optional
+import queue
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Union
+
+from mood_segments import MoodSegment
+from mood_store import MoodStore, to_micros
+
+TimeLike = Union[datetime, float]
+
+
+def _micros(value: TimeLike) -> int:
+    return to_micros(value) if isinstance(value, datetime) else round(float(value) * 1_000_000)
+
+
+def _is_legacy_json(path: str) -> bool:
+    """True if the file holds the old single JSON array format"""
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(4096), b''):
+            stripped = chunk.lstrip()
+            if stripped:
+                return stripped[:1] == b'['
+    return False
+
+
+def migrate_json_history(path: str, backup: bool = True) -> int:
+    """Convert a legacy JSON-array history file to JSON Lines in place
+
+    The original file is kept as ``<path>.bak`` unless ``backup`` is False.
+    Returns the number of migrated entries.
+    """
+    try:
+        with open(path, 'r') as f:
+            entries = json.load(f)
+    except json.JSONDecodeError:
+        entries = []
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+    if backup:
+        shutil.copy2(path, path + '.bak')
+    os.replace(tmp_path, path)
+    return len(entries)
+
+
+class _FileLock:
+    """Exclusive advisory lock on a sidecar file, shared between processes"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'a+b')
+        if os.name == 'nt':
+            import msvcrt
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+
 
 class MoodLogger:
-    """Logs mood detection history for tracking patterns over time"""
-    
-    def __init__(self, history_file: str = "mood_history.json"):
+    """Logs mood detection history for tracking patterns over time
+
+    History is stored as JSON Lines, one entry per line, and only ever
+    appended to. Entries logged in quick succession are written together
+    (after ``flush_every`` entries or ``flush_interval`` seconds), and any
+    pending entries are written on ``flush()``, ``close()`` or interpreter
+    exit. A line cut short by a crash is dropped on the next load.
+
+    In memory, history is a time-sorted ``MoodStore`` of compact columns:
+    summaries come from running totals (overall and per local day and hour)
+    or ``np.bincount`` over a slice, and time-range queries are binary
+    searches. Days and hours are local clock time, like the logged ISO
+    timestamps. Entries are ordered by time rather than file order (one
+    logged while the clock went backwards is inserted in place), and an
+    entry without a usable timestamp takes the time of the one before it.
+    With ``mmap_dir`` the columns are memory-mapped files there, and only
+    lines appended to the JSON Lines file since the last sync are parsed at
+    start-up.
+
+    All methods are thread-safe. Several processes (e.g. the web server and
+    ``enhanced_main.py --history``) can share one history file: writes hold
+    an exclusive lock on ``<history_file>.lock`` and first pick up lines the
+    other processes appended, and ``refresh()`` does the same on demand. An
+    ``mmap_dir`` belongs to a single process.
+    """
+
+    def __init__(self, history_file: str = "mood_history.json",
+                 flush_every: int = 32, flush_interval: float = 1.0,
+                 fsync: bool = False, mmap_dir: Optional[str] = None):
         self.history_file = history_file
-        self.history = self._load_history()
-    
-    def _load_history(self) -> List[Dict]:
-        """Load existing mood history from file"""
-        if os.path.exists(self.history_file):
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.skipped_lines = 0
+        self._pending: List[str] = []
+        self._last_flush = 0.0
+
+        self._lock = threading.RLock()
+        self._file_lock = _FileLock(history_file + '.lock')
+
+        self.store = MoodStore(directory=mmap_dir)
+        self.refresh()
+        atexit.register(self.flush)
+
+    def refresh(self) -> int:
+        """Load lines appended to the history file by other processes
+
+        Returns the number of new entries.
+        """
+        with self._lock, self._file_lock:
+            before = len(self.store)
+            self._load_history()
+            return len(self.store) - before
+
+    def _file_id(self, stat: os.stat_result) -> str:
+        return f"{stat.st_dev}:{stat.st_ino}"
+
+    def _reset_store(self):
+        """Drop the loaded rows but keep the entries not yet written out"""
+        self.store.clear()
+        for line in self._pending:
+            self.store.append_entry(json.loads(line))
+
+    def _load_history(self):
+        """Load history lines not yet in the store, repairing a torn last line
+
+        Called with both locks held. Pending entries are already in the store,
+        so the store is only rebuilt when the file was deleted, migrated or
+        replaced by another one (different inode, or shorter than what was
+        already read), and the pending entries are then added back.
+        """
+        if not os.path.exists(self.history_file):
+            if self.store.source_offset:
+                self._reset_store()
+            return
+        if _is_legacy_json(self.history_file):
+            migrate_json_history(self.history_file)
+            self._reset_store()
+
+        stat = os.stat(self.history_file)
+        source_id = self._file_id(stat)
+        offset = self.store.source_offset
+        if offset > stat.st_size or (offset and self.store.source_id not in (None, source_id)):
+            # History file was replaced: rebuild the columns from scratch
+            self._reset_store()
+            offset = 0
+
+        entries = []
+        good_end = offset
+        torn_tail = False
+        with open(self.history_file, 'rb') as f:
+            f.seek(offset)
+            for raw in f:
+                complete = raw.endswith(b'\n')
+                line = raw.strip()
+                if line:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        if not complete:
+                            torn_tail = True
+                            break
+                        self.skipped_lines += 1
+                good_end += len(raw)
+                if not complete:
+                    # Valid entry without its newline: terminate it below
+                    torn_tail = True
+
+        if torn_tail:
+            with open(self.history_file, 'r+b') as f:
+                f.truncate(good_end)
+                if good_end > 0:
+                    f.seek(good_end - 1)
+                    if f.read(1) != b'\n':
+                        f.write(b'\n')
+                        good_end += 1
+
+        timestamps = []
+        previous = int(self.store.timestamps[-1]) if len(self.store) else 0
+        for entry in entries:
             try:
-                with open(self.history_file, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                return []
-        return []
-    
-    def log_mood(self, mood: str, confidence: float = 0.0, 
-                 method: str = "unknown", notes: str = ""):
-        """Log a mood detection event"""
+                previous = to_micros(datetime.fromisoformat(entry["timestamp"]))
+            except (KeyError, TypeError, ValueError):
+                pass  # Keep file order for entries without a usable time
+            timestamps.append(previous)
+        self.store.extend_entries(entries, timestamps)
+        self.store.sync(good_end, source_id)
+
+    @property
+    def history(self) -> List[Dict]:
+        """All entries as dicts (builds a list; prefer the query methods)"""
+        with self._lock:
+            return self.store.entries()
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def log_mood(self, mood: str, confidence: float = 0.0,
+                 method: str = "unknown", notes: str = "",
+                 timestamp: Optional[datetime] = None,
+                 duration: float = 0.0, frames: int = 1):
+        """Log a mood detection event (``timestamp`` defaults to now)
+
+        ``duration`` and ``frames`` describe an aggregated segment of frames.
+        """
+        now = timestamp or datetime.now()
         entry = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now.isoformat(),
             "mood": mood,
             "confidence": confidence,
             "method": method,
             "notes": notes
         }
-        self.history.append(entry)
-        self._save_history()
-    
-    def _save_history(self):
-        """Save mood history to file"""
-        with open(self.history_file, 'w') as f:
-            json.dump(self.history, f, indent=2)
-    
+        if frames != 1 or duration:
+            entry["duration"] = round(duration, 3)
+            entry["frames"] = frames
+        line = json.dumps(entry)
+        with self._lock:
+            self.store.append(to_micros(now), mood, confidence, method, notes, duration, frames)
+            self._pending.append(line)
+            if (len(self._pending) >= self.flush_every
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self.flush()
+
+    def log_segment(self, segment: MoodSegment, method: str = "facial", notes: str = ""):
+        """Log a ``MoodSegment`` as one entry stamped with its start time"""
+        self.log_mood(segment.mood, segment.mean_confidence, method, notes,
+                      timestamp=segment.started_at, duration=segment.duration,
+                      frames=segment.frames)
+
+    def flush(self):
+        """Append all pending entries to the history file"""
+        with self._lock:
+            if not self._pending:
+                return
+            data = '\n'.join(self._pending) + '\n'
+            with self._file_lock:
+                # Lines other processes wrote since our last read come first
+                self._load_history()
+                with open(self.history_file, 'a', encoding='utf-8') as f:
+                    f.write(data)
+                    f.flush()
+                    if self.fsync:
+                        os.fsync(f.fileno())
+                    end = f.tell()
+                    source_id = self._file_id(os.fstat(f.fileno()))
+            self._pending = []
+            self._last_flush = time.monotonic()
+            self.store.sync(end, source_id)
+
+    def close(self):
+        """Write pending entries and stop flushing at exit"""
+        self.flush()
+        atexit.unregister(self.flush)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
     def get_recent_moods(self, count: int = 10) -> List[Dict]:
         """Get the most recent mood entries"""
-        return self.history[-count:] if self.history else []
-    
+        with self._lock:
+            n = len(self.store)
+            return self.store.entries(n - count, n) if count > 0 else []
+
     def get_mood_summary(self) -> Dict[str, int]:
         """Get a summary count of all moods"""
-        summary = {}
-        for entry in self.history:
-            mood = entry.get("mood", "Unknown")
-            summary[mood] = summary.get(mood, 0) + 1
-        return summary
-    
+        with self._lock:
+            names = self.store.mood_names
+            totals = self.store.mood_totals
+            return {name: int(totals[i]) for i, name in enumerate(names) if totals[i]}
+
+    def get_method_summary(self) -> Dict[str, int]:
+        """Get a count of entries per detection method"""
+        with self._lock:
+            names = self.store.method_names
+            totals = self.store.method_totals
+            return {name: int(totals[i]) for i, name in enumerate(names) if totals[i]}
+
+    def get_mood_durations(self, start: Optional[TimeLike] = None,
+                           end: Optional[TimeLike] = None) -> Dict[str, float]:
+        """Seconds spent in each mood, from segment durations"""
+        with self._lock:
+            lo, hi = self._range_bounds(start, end)
+            durations = self.store.counts(self.store.moods[lo:hi], self.store.mood_names,
+                                          weights=self.store.durations[lo:hi])
+            return {mood: round(seconds, 3) for mood, seconds in durations.items()}
+
+    def get_daily_summary(self, day: Optional[datetime] = None) -> Dict[str, int]:
+        """Mood counts for one day (default today)"""
+        with self._lock:
+            return self.store.day_counts(day or datetime.now())
+
+    def get_hourly_summary(self, hour: Optional[datetime] = None) -> Dict[str, int]:
+        """Mood counts for one hour (default the current hour)"""
+        with self._lock:
+            return self.store.hour_counts(hour or datetime.now())
+
+    def get_range_summary(self, start: Optional[TimeLike] = None,
+                          end: Optional[TimeLike] = None) -> Dict[str, int]:
+        """Mood counts for entries with start <= timestamp < end"""
+        with self._lock:
+            lo, hi = self._range_bounds(start, end)
+            return self.store.counts(self.store.moods[lo:hi], self.store.mood_names)
+
+    def _range_bounds(self, start: Optional[TimeLike], end: Optional[TimeLike]):
+        lo = 0 if start is None else self.store.search(_micros(start))
+        hi = len(self.store) if end is None else self.store.search(_micros(end))
+        return lo, max(lo, hi)
+
+    def get_range(self, start: Optional[TimeLike] = None,
+                  end: Optional[TimeLike] = None) -> List[Dict]:
+        """Entries with start <= timestamp < end (datetimes or epoch seconds)"""
+        with self._lock:
+            lo, hi = self._range_bounds(start, end)
+            return self.store.entries(lo, hi)
+
+    def count_range(self, start: Optional[TimeLike] = None,
+                    end: Optional[TimeLike] = None) -> int:
+        """Number of entries with start <= timestamp < end"""
+        with self._lock:
+            lo, hi = self._range_bounds(start, end)
+            return hi - lo
+
     def get_today_moods(self) -> List[Dict]:
         """Get all mood entries from today"""
-        today = datetime.now().date()
-        return [
-            entry for entry in self.history
-            if datetime.fromisoformat(entry["timestamp"]).date() == today
-        ]
+        midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        return self.get_range(midnight, midnight + timedelta(days=1))
+
+
+_STOP = object()
+
+
+class MoodLogWriter:
+    """Logs moods from hot paths (frame loops, request handlers) without blocking
+
+    ``submit()`` only puts the event on a lock-free queue; a single
+    background thread drains it into the ``MoodLogger`` and flushes pending
+    entries whenever the queue goes idle for ``flush_interval`` seconds.
+    """
+
+    def __init__(self, logger: MoodLogger):
+        self.logger = logger
+        self.errors = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="mood-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, mood: str, confidence: float = 0.0,
+               method: str = "unknown", notes: str = ""):
+        """Queue a mood event, timestamped now; never blocks"""
+        self._queue.put((datetime.now(), mood, confidence, method, notes, 0.0, 1))
+
+    def submit_segment(self, segment: MoodSegment, method: str = "facial", notes: str = ""):
+        """Queue a ``MoodSegment``; never blocks"""
+        self._queue.put((segment.started_at, segment.mood, segment.mean_confidence,
+                         method, notes, segment.duration, segment.frames))
+
+    @property
+    def backlog(self) -> int:
+        """Events submitted but not yet written"""
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.logger.flush_interval)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                break
+            try:
+                if item is None:
+                    self.logger.flush()
+                else:
+                    timestamp, mood, confidence, method, notes, duration, frames = item
+                    self.logger.log_mood(mood, confidence, method, notes, timestamp=timestamp,
+                                         duration=duration, frames=frames)
+            except Exception:
+                # A full disk or similar must not kill the writer thread
+                self.errors += 1
+        self.logger.flush()
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """Write everything queued so far and stop the writer thread"""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        atexit.unregister(self.close)
+
+
+if __name__ == "__main__":
+    # One-shot migration: python mood_logger.py migrate [history_file]
+    if len(sys.argv) > 1 and sys.argv[1] == "migrate":
+        path = sys.argv[2] if len(sys.argv) > 2 else "mood_history.json"
+        if os.path.exists(path) and _is_legacy_json(path):
+            count = migrate_json_history(path)
+            print(f"Migrated {count} entries in {path} to JSON Lines (backup: {path}.bak)")
+        else:
+            print(f"{path} is already in JSON Lines format (or does not exist)")
+    else:
+        print("Usage: python mood_logger.py migrate [history_file]")
@@ -0,0 +1,157 @@
+"""Collapse per-frame emotion detections into mood segments
+
+A webcam produces many identical detections per second. ``MoodSegmenter``
+turns that stream into one record per stretch of the same mood:
+
+    segmenter = MoodSegmenter(switch_frames=3, max_seconds=60)
+    for segment in segmenter.update("happy", 0.82):
+        logger.log_mood(segment.mood, segment.mean_confidence, ...)
+
+A different mood only ends the current segment after ``switch_frames``
+consecutive frames (hysteresis), so single misclassified frames don't
+split it. Segments are also closed after ``max_seconds`` (one record per
+window) or when no frame arrived for ``gap_seconds``.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+
+
+@dataclass
+class MoodSegment:
+    """A stretch of consecutive frames showing the same mood"""
+    mood: str
+    start: float
+    end: float
+    frames: int
+    mean_confidence: float
+    max_confidence: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    @property
+    def started_at(self) -> datetime:
+        return datetime.fromtimestamp(self.start)
+
+    def to_dict(self) -> dict:
+        return {
+            'mood': self.mood,
+            'start': self.started_at.isoformat(),
+            'end': datetime.fromtimestamp(self.end).isoformat(),
+            'duration': round(self.duration, 3),
+            'frames': self.frames,
+            'mean_confidence': round(self.mean_confidence, 4),
+            'max_confidence': round(self.max_confidence, 4)
+        }
+
+
+class _Run:
+    """Running statistics for frames of one mood"""
+
+    def __init__(self, mood: str, timestamp: float):
+        self.mood = mood
+        self.start = timestamp
+        self.end = timestamp
+        self.frames = 0
+        self.scored = 0
+        self.confidence_sum = 0.0
+        self.max_confidence = 0.0
+
+    def add(self, confidence: float, timestamp: float, scored: bool = True):
+        self.end = timestamp
+        self.frames += 1
+        if scored:
+            self.scored += 1
+            self.confidence_sum += confidence
+            self.max_confidence = max(self.max_confidence, confidence)
+
+    def absorb(self, other: "_Run"):
+        """Count another run's frames as part of this one (without their scores)"""
+        self.end = max(self.end, other.end)
+        self.frames += other.frames
+
+    def segment(self, end: Optional[float] = None) -> MoodSegment:
+        return MoodSegment(self.mood, self.start, self.end if end is None else end, self.frames,
+                           self.confidence_sum / max(self.scored, 1), self.max_confidence)
+
+
+class MoodSegmenter:
+    """Thread-safe per-frame mood -> ``MoodSegment`` aggregation with hysteresis"""
+
+    def __init__(self, switch_frames: int = 3, max_seconds: Optional[float] = 60.0,
+                 gap_seconds: Optional[float] = 2.0):
+        self.switch_frames = max(1, switch_frames)
+        self.max_seconds = max_seconds
+        self.gap_seconds = gap_seconds
+        self._lock = threading.Lock()
+        self._current: Optional[_Run] = None
+        self._candidate: Optional[_Run] = None
+
+    @property
+    def current_mood(self) -> Optional[str]:
+        current = self._current
+        return current.mood if current else None
+
+    def update(self, mood: str, confidence: float = 0.0,
+               timestamp: Optional[float] = None) -> List[MoodSegment]:
+        """Add one frame's mood; returns the segments it closed (usually none)"""
+        now = time.time() if timestamp is None else timestamp
+        with self._lock:
+            closed = self._expire(now)
+            current = self._current
+
+            if current is None:
+                self._current = _Run(mood, now)
+                self._current.add(confidence, now)
+            elif mood == current.mood:
+                if self._candidate is not None:
+                    # The other mood didn't last: its frames belong to this segment
+                    current.absorb(self._candidate)
+                    self._candidate = None
+                current.add(confidence, now)
+            else:
+                if self._candidate is None or self._candidate.mood != mood:
+                    self._candidate = _Run(mood, now)
+                self._candidate.add(confidence, now)
+                if self._candidate.frames >= self.switch_frames:
+                    closed.append(current.segment(end=self._candidate.start))
+                    self._current, self._candidate = self._candidate, None
+
+            current = self._current
+            if self.max_seconds is not None and current.end - current.start >= self.max_seconds:
+                # One record per window: close it and keep going with the same mood
+                closed.append(current.segment())
+                self._current = None
+                if self._candidate is not None:
+                    self._current, self._candidate = self._candidate, None
+            return closed
+
+    def expire(self, timestamp: Optional[float] = None) -> List[MoodSegment]:
+        """Close the open segment if no frame arrived for ``gap_seconds``"""
+        with self._lock:
+            return self._expire(time.time() if timestamp is None else timestamp)
+
+    def flush(self) -> List[MoodSegment]:
+        """Close and return the open segment, if any"""
+        with self._lock:
+            return self._close()
+
+    def _expire(self, now: float) -> List[MoodSegment]:
+        last = self._candidate or self._current
+        if last is not None and self.gap_seconds is not None and now - last.end > self.gap_seconds:
+            return self._close()
+        return []
+
+    def _close(self) -> List[MoodSegment]:
+        current, candidate = self._current, self._candidate
+        self._current = self._candidate = None
+        if current is None:
+            return []
+        if candidate is not None:
+            current.absorb(candidate)
+        return [current.segment()]
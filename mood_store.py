@@ -0,0 +1,414 @@
+"""Compact columnar storage for mood history
+
+Each logged event costs 26 bytes instead of a dict of strings:
+
+- ``timestamp``  int64 microseconds since the epoch
+- ``mood``       uint8 code into the interned mood names
+- ``method``     uint8 code into the interned method names
+- ``confidence`` float32
+- ``note``       uint32 reference into the notes text (0 = no note)
+- ``duration``   float32 seconds covered (0 for a single detection)
+- ``frames``     uint32 frames aggregated into the entry (1 for a single one)
+
+Mood and method names are interned (there are only a few of them); free-text
+notes are appended to a separate text store instead, so they don't grow
+a lookup table or the metadata. Columns live in growable NumPy arrays, or in
+memory-mapped files when a directory is given, so aggregations are vectorized and a large history
+doesn't have to be parsed (or held in RAM) at start-up. Mood counts per
+local day and hour are kept up to date as rows are added, so daily and
+hourly summaries are dictionary lookups.
+"""
+
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+COLUMNS = (
+    ("timestamp", np.int64),
+    ("mood", np.uint8),
+    ("method", np.uint8),
+    ("confidence", np.float32),
+    ("note", np.uint32),
+    ("duration", np.float32),
+    ("frames", np.uint32),
+)
+META_FILE = "meta.json"
+NOTES_FILE = "notes.jsonl"
+# Local UTC offsets are whole quarter hours, so every row in one UTC quarter
+# hour falls in the same local hour
+_QUARTER = 900 * 1_000_000
+
+
+def to_micros(moment: datetime) -> int:
+    """Naive local (or aware) datetime -> microseconds since the epoch"""
+    return round(moment.timestamp() * 1_000_000)
+
+
+def from_micros(micros: int) -> datetime:
+    """Microseconds since the epoch -> naive local datetime"""
+    seconds, micro = divmod(int(micros), 1_000_000)
+    return datetime.fromtimestamp(seconds).replace(microsecond=micro)
+
+
+class _Interner:
+    """String <-> small integer code table"""
+
+    def __init__(self, values: Optional[List[str]] = None, limit: Optional[int] = None):
+        self.values: List[str] = list(values or [])
+        self.codes: Dict[str, int] = {value: i for i, value in enumerate(self.values)}
+        self.limit = limit
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            if self.limit is not None and code >= self.limit:
+                raise ValueError(f"Too many distinct values (limit {self.limit}): {value!r}")
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+
+class _TextHeap:
+    """Append-only free text, each value referenced by 1 + its byte offset
+
+    Values are JSON strings, one per line, kept in memory or appended to a
+    file. Reference 0 is the empty string. Repeating the previous value
+    reuses its reference.
+    """
+
+    def __init__(self, path: Optional[str] = None, size: int = 0):
+        self._data = bytearray()
+        self._file = None
+        if path:
+            self._file = open(path, 'a+b')
+            # Drop text written after the last sync; no stored row uses it
+            self._file.truncate(size)
+        self.size = size
+        self._last = ("", 0)
+
+    def add(self, text: str) -> int:
+        if text == self._last[0]:
+            return self._last[1]
+        line = json.dumps(text).encode('utf-8') + b'\n'
+        ref = self.size + 1
+        if ref + len(line) > 0xFFFFFFFF:
+            raise ValueError("Notes text is full (4 GiB)")
+        if self._file:
+            self._file.write(line)
+        else:
+            self._data += line
+        self.size += len(line)
+        self._last = (text, ref)
+        return ref
+
+    def get(self, ref: int) -> str:
+        if not ref:
+            return ""
+        if self._file:
+            self._file.seek(ref - 1)
+            line = self._file.readline()
+        else:
+            line = self._data[ref - 1:self._data.index(b'\n', ref - 1)]
+        return json.loads(line)
+
+    def clear(self):
+        if self._file:
+            self._file.truncate(0)
+        self._data = bytearray()
+        self.size = 0
+        self._last = ("", 0)
+
+    def flush(self):
+        if self._file:
+            self._file.flush()
+
+
+class MoodStore:
+    """Append-mostly column store for mood events, kept sorted by time
+
+    With ``directory`` the columns are memory-mapped ``<column>.bin`` files,
+    notes go to ``notes.jsonl`` and ``meta.json`` holds the row count and
+    the interned mood and method names; call ``sync()`` to make the current
+    state durable.
+    """
+
+    def __init__(self, capacity: int = 1024, directory: Optional[str] = None):
+        self.directory = directory
+        self.source_offset = 0
+        self.source_id: Optional[str] = None
+        self._size = 0
+        self._moods = _Interner(limit=256)
+        self._methods = _Interner(limit=256)
+        self._columns: Dict[str, np.ndarray] = {}
+        meta = {}
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            meta_path = os.path.join(directory, META_FILE)
+            if os.path.exists(meta_path):
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                self._size = meta["size"]
+                self.source_offset = meta.get("source_offset", 0)
+                self.source_id = meta.get("source_id")
+                self._moods = _Interner(meta["moods"], limit=256)
+                self._methods = _Interner(meta["methods"], limit=256)
+        self._notes = _TextHeap(directory and os.path.join(directory, NOTES_FILE),
+                                meta.get("notes_size", 0))
+        self._allocate(max(capacity, self._size))
+        if "notes" in meta:
+            # Older stores interned every note in meta.json: move them out
+            refs = np.array([self._notes.add(note) for note in meta["notes"]], dtype=np.uint32)
+            self.notes[:] = refs[self.notes]
+            self.sync()
+
+        self.mood_totals = np.bincount(self.moods, minlength=256).astype(np.int64)
+        self.method_totals = np.bincount(self.methods, minlength=256).astype(np.int64)
+        # Local day / hour -> {mood code: count}, kept up to date on every add
+        self._days: Dict[str, Dict[int, int]] = {}
+        self._hours: Dict[str, Dict[int, int]] = {}
+        self._count_buckets(self.timestamps, self.moods)
+
+    def _allocate(self, capacity: int):
+        capacity = max(capacity, 16)
+        for name, dtype in COLUMNS:
+            old = self._columns.get(name)
+            if self.directory:
+                path = os.path.join(self.directory, f"{name}.bin")
+                if old is not None:
+                    old.flush()
+                    del self._columns[name]
+                    del old
+                nbytes = capacity * np.dtype(dtype).itemsize
+                created = not os.path.exists(path)
+                with open(path, 'w+b' if created else 'r+b') as f:
+                    f.seek(0, os.SEEK_END)
+                    if f.tell() < nbytes:
+                        f.truncate(nbytes)
+                self._columns[name] = np.memmap(path, dtype=dtype, mode='r+', shape=(capacity,))
+                if created and name == "frames":
+                    # Column added after these rows were stored: one frame each
+                    self._columns[name][:self._size] = 1
+            else:
+                column = np.empty(capacity, dtype=dtype)
+                if old is not None:
+                    column[:self._size] = old[:self._size]
+                self._columns[name] = column
+        self._capacity = capacity
+
+    def _bump(self, hour: str, mood: int, count: int = 1):
+        for buckets, key in ((self._days, hour[:10]), (self._hours, hour)):
+            counts = buckets.setdefault(key, {})
+            counts[mood] = counts.get(mood, 0) + count
+
+    def _count_buckets(self, timestamps: np.ndarray, moods: np.ndarray):
+        """Add rows to the day / hour buckets, converting each quarter hour once"""
+        if not len(timestamps):
+            return
+        quarters, inverse = np.unique(timestamps // _QUARTER, return_inverse=True)
+        hours = [datetime.fromtimestamp(int(q) * 900).strftime("%Y-%m-%dT%H") for q in quarters]
+        keys, counts = np.unique(inverse.astype(np.int64) * 256 + moods, return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self._bump(hours[key // 256], key % 256, count)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the stored rows"""
+        return self._size * sum(np.dtype(dtype).itemsize for _, dtype in COLUMNS)
+
+    # Read-only views of the stored rows
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._columns["timestamp"][:self._size]
+
+    @property
+    def moods(self) -> np.ndarray:
+        return self._columns["mood"][:self._size]
+
+    @property
+    def methods(self) -> np.ndarray:
+        return self._columns["method"][:self._size]
+
+    @property
+    def confidences(self) -> np.ndarray:
+        return self._columns["confidence"][:self._size]
+
+    @property
+    def notes(self) -> np.ndarray:
+        return self._columns["note"][:self._size]
+
+    @property
+    def durations(self) -> np.ndarray:
+        return self._columns["duration"][:self._size]
+
+    @property
+    def frames(self) -> np.ndarray:
+        return self._columns["frames"][:self._size]
+
+    @property
+    def mood_names(self) -> List[str]:
+        return self._moods.values
+
+    @property
+    def method_names(self) -> List[str]:
+        return self._methods.values
+
+    def mood_code(self, mood: str) -> Optional[int]:
+        return self._moods.codes.get(mood)
+
+    def append(self, timestamp: int, mood: str, confidence: float = 0.0,
+               method: str = "unknown", notes: str = "",
+               duration: float = 0.0, frames: int = 1):
+        """Add one event (``timestamp`` in epoch microseconds), keeping time order"""
+        row = (timestamp, self._moods.code(mood), self._methods.code(method),
+               confidence, self._notes.add(notes), duration, frames)
+        if self._size == self._capacity:
+            self._allocate(self._capacity * 2)
+
+        n = self._size
+        position = n
+        if n and timestamp < self._columns["timestamp"][n - 1]:
+            # Clock went backwards: shift the later rows up by one
+            position = int(np.searchsorted(self.timestamps, timestamp, side='right'))
+        for (name, _), value in zip(COLUMNS, row):
+            column = self._columns[name]
+            if position < n:
+                column[position + 1:n + 1] = column[position:n]
+            column[position] = value
+        self._size = n + 1
+        self.mood_totals[row[1]] += 1
+        self.method_totals[row[2]] += 1
+        self._bump(from_micros(timestamp).strftime("%Y-%m-%dT%H"), row[1])
+
+    def append_entry(self, entry: Dict, timestamp: Optional[int] = None):
+        """Add a history dict; ``timestamp`` overrides the parsed ISO time"""
+        if timestamp is None:
+            timestamp = to_micros(datetime.fromisoformat(entry["timestamp"]))
+        self.append(timestamp, entry.get("mood", "Unknown"), entry.get("confidence", 0.0),
+                    entry.get("method", "unknown"), entry.get("notes", "") or "",
+                    entry.get("duration", 0.0), entry.get("frames", 1))
+
+    def extend_entries(self, entries: List[Dict], timestamps: List[int]):
+        """Bulk-add history dicts with their epoch-microsecond timestamps"""
+        count = len(entries)
+        if not count:
+            return
+        n = self._size
+        if n + count > self._capacity:
+            self._allocate(max(self._capacity * 2, n + count))
+
+        new = {
+            "timestamp": np.array(timestamps, dtype=np.int64),
+            "mood": np.array([self._moods.code(e.get("mood", "Unknown")) for e in entries],
+                             dtype=np.uint8),
+            "method": np.array([self._methods.code(e.get("method", "unknown")) for e in entries],
+                               dtype=np.uint8),
+            "confidence": np.array([e.get("confidence", 0.0) for e in entries], dtype=np.float32),
+            "note": np.array([self._notes.add(e.get("notes", "") or "") for e in entries],
+                             dtype=np.uint32),
+            "duration": np.array([e.get("duration", 0.0) for e in entries], dtype=np.float32),
+            "frames": np.array([e.get("frames", 1) for e in entries], dtype=np.uint32),
+        }
+        for name, _ in COLUMNS:
+            self._columns[name][n:n + count] = new[name]
+        self._size = n + count
+
+        times = self.timestamps
+        if np.any(times[max(n - 1, 0) + 1:] < times[max(n - 1, 0):-1]):
+            order = np.argsort(times, kind='stable')
+            for name, _ in COLUMNS:
+                column = self._columns[name]
+                column[:self._size] = column[:self._size][order]
+        self.mood_totals += np.bincount(new["mood"], minlength=256)
+        self.method_totals += np.bincount(new["method"], minlength=256)
+        self._count_buckets(new["timestamp"], new["mood"])
+
+    def clear(self):
+        """Drop every row, interned name and note"""
+        self._size = 0
+        self.source_offset = 0
+        self.source_id = None
+        self._moods = _Interner(limit=256)
+        self._methods = _Interner(limit=256)
+        self._notes.clear()
+        self.mood_totals[:] = 0
+        self.method_totals[:] = 0
+        self._days.clear()
+        self._hours.clear()
+
+    def search(self, timestamp: int, side: str = 'left') -> int:
+        """Row index for an epoch-microsecond timestamp (binary search)"""
+        return int(np.searchsorted(self.timestamps, timestamp, side=side))
+
+    def entry(self, index: int) -> Dict:
+        """One row as a history dict"""
+        index = range(self._size)[index]
+        return self.entries(index, index + 1)[0]
+
+    def entries(self, start: int = 0, stop: Optional[int] = None) -> List[Dict]:
+        """Rows ``start:stop`` as history dicts"""
+        stop = self._size if stop is None else min(stop, self._size)
+        rows = slice(max(start, 0), stop)
+        moods, methods, note = self._moods.values, self._methods.values, self._notes.get
+        return [{
+            "timestamp": from_micros(timestamp).isoformat(),
+            "mood": moods[mood],
+            "confidence": round(confidence, 6),
+            "method": methods[method],
+            "notes": note(ref),
+            "duration": round(duration, 3),
+            "frames": frame_count
+        } for timestamp, mood, method, confidence, ref, duration, frame_count in zip(
+            *(self._columns[name][rows].tolist() for name, _ in COLUMNS))]
+
+    def counts(self, codes: np.ndarray, names: List[str],
+               weights: Optional[np.ndarray] = None) -> Dict[str, float]:
+        """Name -> count (or summed ``weights``) for a slice of mood or method codes"""
+        totals = np.bincount(codes, weights=weights, minlength=len(names))
+        cast = int if weights is None else float
+        return {names[i]: cast(totals[i]) for i in np.flatnonzero(totals)}
+
+    def day_counts(self, day: datetime) -> Dict[str, int]:
+        """Mood counts for the local calendar day of ``day``"""
+        counts = self._days.get(day.strftime("%Y-%m-%d"), {})
+        return {self._moods.values[code]: count for code, count in counts.items()}
+
+    def hour_counts(self, hour: datetime) -> Dict[str, int]:
+        """Mood counts for the local clock hour of ``hour``"""
+        counts = self._hours.get(hour.strftime("%Y-%m-%dT%H"), {})
+        return {self._moods.values[code]: count for code, count in counts.items()}
+
+    def sync(self, source_offset: Optional[int] = None, source_id: Optional[str] = None):
+        """Flush memory-mapped columns and write the metadata atomically
+
+        ``source_offset`` and ``source_id`` record how far (and which) history
+        file the rows were loaded from.
+        """
+        if source_offset is not None:
+            self.source_offset = source_offset
+        if source_id is not None:
+            self.source_id = source_id
+        if not self.directory:
+            return
+        for column in self._columns.values():
+            column.flush()
+        self._notes.flush()
+        meta = {
+            "size": self._size,
+            "source_offset": self.source_offset,
+            "source_id": self.source_id,
+            "moods": self._moods.values,
+            "methods": self._methods.values,
+            "notes_size": self._notes.size
+        }
+        meta_path = os.path.join(self.directory, META_FILE)
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + '.tmp', meta_path)
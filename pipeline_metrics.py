@@ -0,0 +1,260 @@
+"""Low-overhead instrumentation for the video pipeline
+
+Stage durations go into fixed-bucket histograms and frame events into
+counters. Every thread writes to its own shard (created on first use), so
+the hot path takes no locks; shards are only summed when the metrics are
+read. ``PipelineMetrics`` renders everything in the Prometheus text format
+(``/metrics``) or as a JSON summary with percentiles and frame rates.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds in seconds; a final +Inf bucket catches the rest
+LATENCY_BUCKETS = (0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.02, 0.035,
+                   0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0, 2.5)
+
+
+class _Shards:
+    """Per-thread storage, merged on read
+
+    Shards of threads that have exited are folded into one retired shard so
+    restarting the pipeline doesn't grow the shard list forever.
+    """
+
+    def __init__(self, new_shard, merge):
+        self._new_shard = new_shard
+        self._merge = merge
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[Tuple[threading.Thread, dict]] = []
+        self._retired = new_shard()
+
+    def local(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = self._new_shard()
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def collect(self) -> dict:
+        with self._lock:
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    self._merge(self._retired, shard)
+            self._shards = alive
+            total = self._new_shard()
+            self._merge(total, self._retired)
+            for _, shard in alive:
+                self._merge(total, shard)
+        return total
+
+
+class _Series:
+    """Bucket counts, sum and count of one labelled histogram"""
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * (buckets + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """Fixed-bucket histogram keyed by a label value"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._shards = _Shards(dict, self._merge)
+
+    def observe(self, label: str, value: float):
+        shard = self._shards.local()
+        series = shard.get(label)
+        if series is None:
+            series = shard[label] = _Series(len(self.buckets))
+        series.counts[bisect_left(self.buckets, value)] += 1
+        series.sum += value
+        series.count += 1
+
+    def _merge(self, into: dict, shard: dict):
+        for label, series in list(shard.items()):
+            total = into.get(label)
+            if total is None:
+                total = into[label] = _Series(len(self.buckets))
+            total.counts = [a + b for a, b in zip(total.counts, series.counts)]
+            total.sum += series.sum
+            total.count += series.count
+
+    def collect(self) -> Dict[str, _Series]:
+        return self._shards.collect()
+
+    def quantile(self, series: _Series, q: float) -> Optional[float]:
+        """Estimate a quantile by interpolating within its bucket"""
+        if not series.count:
+            return None
+        rank = q * series.count
+        seen = 0
+        for i, count in enumerate(series.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    # Beyond the last bound all we know is the lower edge
+                    return lower
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class Counter:
+    """Monotonic counters keyed by a label value"""
+
+    def __init__(self):
+        self._shards = _Shards(dict, self._merge)
+
+    def inc(self, label: str, amount: int = 1):
+        shard = self._shards.local()
+        shard[label] = shard.get(label, 0) + amount
+
+    @staticmethod
+    def _merge(into: dict, shard: dict):
+        for label, value in list(shard.items()):
+            into[label] = into.get(label, 0) + value
+
+    def collect(self) -> Dict[str, int]:
+        return self._shards.collect()
+
+
+class PipelineMetrics:
+    """Stage timings, end-to-end latencies and frame counters of the pipeline
+
+    - ``stage(name, seconds)``: time spent in one stage
+    - ``latency(name, seconds)``: capture to inference result / encoded
+      frame / frame handed to a client
+    - ``frame(event)``: captured, inferred, encoded or sent frames
+    - ``dropped(queue)``: frames discarded by a full queue
+    - ``error(stage)``: frames a stage failed on
+
+    Frame rates are derived from the counters over the last
+    ``rate_window`` seconds.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS, rate_window: float = 10.0):
+        self.stages = Histogram(buckets)
+        self.latencies = Histogram(buckets)
+        self.frames = Counter()
+        self.drops = Counter()
+        self.errors = Counter()
+        self.rate_window = rate_window
+        self.started = time.time()
+        self._rate_lock = threading.Lock()
+        self._samples: Deque[Tuple[float, Dict[str, int]]] = deque()
+
+    def stage(self, name: str, seconds: float):
+        self.stages.observe(name, seconds)
+
+    def latency(self, name: str, seconds: float):
+        self.latencies.observe(name, seconds)
+
+    def frame(self, event: str):
+        self.frames.inc(event)
+
+    def dropped(self, queue: str):
+        self.drops.inc(queue)
+
+    def error(self, stage: str):
+        self.errors.inc(stage)
+
+    def rates(self, frames: Optional[Dict[str, int]] = None) -> Dict[str, float]:
+        """Events per second by frame event over the rate window"""
+        frames = self.frames.collect() if frames is None else frames
+        now = time.time()
+        with self._rate_lock:
+            self._samples.append((now, frames))
+            # Keep one sample at or before the window start as the baseline
+            while len(self._samples) > 2 and self._samples[1][0] <= now - self.rate_window:
+                self._samples.popleft()
+            since, baseline = self._samples[0]
+            if since == now:
+                since, baseline = self.started, {}
+        elapsed = max(now - since, 1e-9)
+        return {event: round((count - baseline.get(event, 0)) / elapsed, 2)
+                for event, count in frames.items()}
+
+    def prometheus(self, prefix: str = "mood_pipeline") -> str:
+        """All metrics in the Prometheus text exposition format"""
+        frames = self.frames.collect()
+        lines = []
+
+        def histogram(histo: Histogram, name: str, label: str, help_text: str):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} histogram")
+            for value, series in sorted(histo.collect().items()):
+                cumulative = 0
+                for bound, count in zip(histo.buckets + (float("inf"),), series.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{prefix}_{name}_bucket{{{label}="{value}",le="{le}"}} {cumulative}')
+                lines.append(f'{prefix}_{name}_sum{{{label}="{value}"}} {series.sum:.6f}')
+                lines.append(f'{prefix}_{name}_count{{{label}="{value}"}} {series.count}')
+
+        histogram(self.stages, "stage_seconds", "stage", "Time spent in each pipeline stage")
+        histogram(self.latencies, "latency_seconds", "to",
+                  "Time from frame capture to inference result, encoded frame or send")
+
+        lines.append(f"# HELP {prefix}_frames_total Frames by pipeline event")
+        lines.append(f"# TYPE {prefix}_frames_total counter")
+        for event, count in sorted(frames.items()):
+            lines.append(f'{prefix}_frames_total{{event="{event}"}} {count}')
+
+        lines.append(f"# HELP {prefix}_dropped_frames_total Frames discarded by a full queue")
+        lines.append(f"# TYPE {prefix}_dropped_frames_total counter")
+        for queue_name, count in sorted(self.drops.collect().items()):
+            lines.append(f'{prefix}_dropped_frames_total{{queue="{queue_name}"}} {count}')
+
+        lines.append(f"# HELP {prefix}_errors_total Frames a pipeline stage failed on")
+        lines.append(f"# TYPE {prefix}_errors_total counter")
+        for stage, count in sorted(self.errors.collect().items()):
+            lines.append(f'{prefix}_errors_total{{stage="{stage}"}} {count}')
+
+        lines.append(f"# HELP {prefix}_fps Frames per second over the last {self.rate_window:g}s")
+        lines.append(f"# TYPE {prefix}_fps gauge")
+        for event, rate in sorted(self.rates(frames).items()):
+            lines.append(f'{prefix}_fps{{event="{event}"}} {rate}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        """JSON-ready summary: per-stage mean/p50/p90/p99 in ms, fps, drops and errors"""
+
+        def describe(histo: Histogram) -> dict:
+            described = {}
+            for label, series in sorted(histo.collect().items()):
+                percentiles = {f"p{int(q * 100)}_ms": round(histo.quantile(series, q) * 1000, 2)
+                               for q in (0.5, 0.9, 0.99)}
+                described[label] = dict(count=series.count,
+                                        mean_ms=round(series.sum / series.count * 1000, 2),
+                                        **percentiles)
+            return described
+
+        frames = self.frames.collect()
+        rates = self.rates(frames)
+        return {
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'stages': describe(self.stages),
+            'latency': describe(self.latencies),
+            'frames': frames,
+            'dropped': self.drops.collect(),
+            'errors': self.errors.collect(),
+            'fps': {
+                'capture': rates.get("captured", 0.0),
+                'inference': rates.get("inferred", 0.0),
+                'stream': rates.get("encoded", 0.0),
+                'sent': rates.get("sent", 0.0)
+            }
+        }
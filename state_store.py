@@ -0,0 +1,77 @@
+"""Versioned, immutable application state shared between threads
+
+Writers never mutate the current state: ``update()`` builds a new frozen
+snapshot with ``dataclasses.replace`` and swaps it in together with a new
+version number, so readers always see one consistent snapshot without
+taking a lock, and can cheaply tell whether anything changed (ETags,
+change-driven push).
+"""
+
+import threading
+from dataclasses import dataclass, replace
+from typing import Any, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class EmotionState:
+    """Everything the web UI shows about the current mood"""
+    emotion: str = "neutral"
+    confidence: float = 0.0
+    message: str = "Welcome! Look at the camera to detect your mood."
+    faces: Tuple[dict, ...] = ()
+    voice_emotion: Optional[str] = None
+    voice_text: str = ""
+    voice_confidence: float = 0.0
+    is_listening: bool = False
+    models_ready: bool = False
+    models_error: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class FrameOverlay:
+    """Faces found in one analyzed frame, for clients that draw the overlay"""
+    frame_id: int = -1
+    width: int = 0
+    height: int = 0
+    faces: Tuple[dict, ...] = ()
+
+
+class StateStore:
+    """Holds the latest ``(version, state)`` pair; the version only grows"""
+
+    def __init__(self, initial: Any):
+        self._changed = threading.Condition()
+        self._current: Tuple[int, Any] = (0, initial)
+
+    def snapshot(self) -> Tuple[int, Any]:
+        """The current version and state (a single atomic read)"""
+        return self._current
+
+    @property
+    def state(self) -> Any:
+        return self._current[1]
+
+    @property
+    def version(self) -> int:
+        return self._current[0]
+
+    def update(self, **changes) -> int:
+        """Swap in a copy of the state with ``changes`` applied
+
+        The version is only bumped if the new state differs. Returns the
+        current version.
+        """
+        with self._changed:
+            version, state = self._current
+            new_state = replace(state, **changes)
+            if new_state == state:
+                return version
+            self._current = (version + 1, new_state)
+            self._changed.notify_all()
+            return version + 1
+
+    def wait(self, since: int, timeout: Optional[float] = None) -> Tuple[int, Any]:
+        """Block until the version moves past ``since`` (or ``timeout`` passes)"""
+        with self._changed:
+            self._changed.wait_for(lambda: self._current[0] > since, timeout)
+            return self._current
@@ -0,0 +1,85 @@
+"""Configurable JPEG encoding for the MJPEG video stream
+
+``StreamEncoder`` scales frames down to ``max_width`` and encodes them at
+the configured JPEG quality, with libjpeg-turbo through PyTurboJPEG when it
+is installed (``backend="auto"``) or OpenCV otherwise. Each multipart part
+is sent as two chunks, the small header from ``part_header`` and the
+encoded frame itself, so the JPEG bytes are never copied into a combined
+buffer and one encoded frame can go to every client unchanged.
+"""
+
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+BOUNDARY = "frame"
+
+
+def part_header(length: int, content_type: str = "image/jpeg",
+                headers: Optional[Dict[str, object]] = None) -> bytes:
+    """Multipart header for one frame of a ``multipart/x-mixed-replace`` stream
+
+    It starts with the CRLF that ends the previous part (before the first
+    part it is ignored as preamble), so the payload needs no trailer.
+    ``headers`` adds extra part headers (e.g. the frame id).
+    """
+    extra = "".join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+    return (f"\r\n--{BOUNDARY}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {length}\r\n{extra}\r\n").encode("ascii")
+
+
+def same_image(a: Optional[np.ndarray], b: Optional[np.ndarray]) -> bool:
+    """Whether two frames have identical pixels (a sparse sample is compared first)"""
+    if a is None or b is None or a.shape != b.shape:
+        return False
+    if a is b:
+        return True
+    # Different frames almost always differ within the sample, which is
+    # much cheaper than comparing every pixel
+    return np.array_equal(a[::16, ::16], b[::16, ::16]) and np.array_equal(a, b)
+
+
+class StreamEncoder:
+    """Scales and JPEG-encodes frames for streaming
+
+    ``backend`` is ``"opencv"``, ``"turbojpeg"`` (PyTurboJPEG, needs the
+    libjpeg-turbo library) or ``"auto"`` to use turbojpeg when available.
+    """
+
+    def __init__(self, quality: int = 80, max_width: Optional[int] = None,
+                 backend: str = "auto"):
+        self.quality = int(min(max(quality, 1), 100))
+        self.max_width = max_width
+        self._turbo = None
+        if backend in ("auto", "turbojpeg"):
+            try:
+                from turbojpeg import TurboJPEG
+                self._turbo = TurboJPEG()
+            except (ImportError, OSError, RuntimeError):
+                # OSError / RuntimeError: the libjpeg-turbo library itself is missing
+                if backend == "turbojpeg":
+                    raise
+        elif backend != "opencv":
+            raise ValueError(f"Unknown stream encoder '{backend}' (use 'auto', 'opencv' or 'turbojpeg')")
+        self.backend = "turbojpeg" if self._turbo is not None else "opencv"
+        self._params = [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+
+    def resize(self, image: np.ndarray) -> np.ndarray:
+        """Scale a frame down to ``max_width`` (returned unchanged if narrower)"""
+        height, width = image.shape[:2]
+        if not self.max_width or width <= self.max_width:
+            return image
+        scale = self.max_width / width
+        return cv2.resize(image, (self.max_width, max(1, round(height * scale))),
+                          interpolation=cv2.INTER_AREA)
+
+    def encode(self, image: np.ndarray) -> Optional[bytes]:
+        """Encode a BGR frame as JPEG bytes"""
+        image = self.resize(image)
+        if self._turbo is not None:
+            return self._turbo.encode(image, quality=self.quality)
+        ok, buffer = cv2.imencode('.jpg', image, self._params)
+        return buffer.tobytes() if ok else None
+
+    __call__ = encode
@@ -27,18 +27,68 @@ try:
 except Exception as e:
     print(f"✗ TextBlob error: {e}")
 
-try:
-    import pandas as pd
-    print("✓ Pandas imported successfully")
-except Exception as e:
-    print(f"✗ Pandas error: {e}")
-
 try:
     import speech_recognition as sr
     print("✓ SpeechRecognition imported successfully")
 except Exception as e:
     print(f"✗ SpeechRecognition error: {e}")
 
+# Test batch text analysis: the vectorised polarity must match TextBlob
+try:
+    from textblob import TextBlob
+    from text_mood import polarity_many, sentiment_tokens
+
+    corpus = [
+        "this isn't great", "I don't think this is a very good idea, honestly!",
+        "what a lovely day it has been", "not good", "not a good day at all",
+        "very very good", "not very good", "really not good", "I am so happy!!",
+        "This is terrible.", "I can't believe how bad that was",
+        "He's not happy, but he's okay", "The food was great but the service was awful",
+        "It's fine I guess...", "Never been better!", "no problem at all",
+        "I'm extremely sad today", "what a wonderful, amazing surprise",
+        "I hate Mondays", "It was 'nice' of them", "the movie was not bad at all",
+        "I don\u2019t like it", "absolutely fantastic experience, e.g. the U.S. tour",
+        "quite disappointing, really", "Mr. Smith was awfully kind", "",
+    ]
+    approx = polarity_many([sentiment_tokens(text) for text in corpus])
+    for text, value in zip(corpus, approx):
+        expected = TextBlob(text).sentiment.polarity
+        assert abs(value - expected) < 1e-4, (text, float(value), expected)
+    print("✓ Batch text polarity matches TextBlob")
+except Exception as e:
+    print(f"✗ Batch text polarity error: {e!r}")
+
+# Test keyword moods: a negated keyword must not fall back to TextBlob,
+# which ignores "not at all" and calls this happy
+try:
+    from voice_mood import analyze_many, analyze_voice_mood
+
+    assert analyze_voice_mood("I am not at all happy")[0] == "neutral"
+    assert analyze_many(["I am not at all happy"])[0][0] == "neutral"
+    assert analyze_voice_mood("I am not sad, I am happy")[0] == "happy"
+    print("✓ Negated keywords handled")
+except Exception as e:
+    print(f"✗ Keyword mood error: {e!r}")
+
+# Test history logging: entries must survive the first write of a new file
+try:
+    import os
+    import tempfile
+    from mood_logger import MoodLogger
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.json")
+        logger = MoodLogger(path)
+        logger.log_mood("happy", 0.9, "facial")
+        logger.log_mood("sad", 0.8, "facial")
+        logger.close()
+        counts = logger.get_mood_summary()
+        assert counts == {"happy": 1, "sad": 1}, counts
+        assert len(MoodLogger(path)) == 2
+    print("✓ Mood history logging works")
+except Exception as e:
+    print(f"✗ Mood history error: {e!r}")
+
 print("\n" + "="*50)
 print("All core dependencies are working!")
 print("="*50)
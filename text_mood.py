@@ -0,0 +1,267 @@
+"""Text mood analysis for single transcripts and large offline batches"""
+
+import re
+from itertools import chain
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import NEGATIVE_THRESHOLD, POSITIVE_THRESHOLD
+from lexicon import MoodLexicon
+
+# Negations recognised by TextBlob's pattern sentiment analyzer. Its
+# tokenizer splits "isn't" into "is n ' t", so contracted negations never
+# reach it as a word and don't flip the polarity.
+SENTIMENT_NEGATIONS = frozenset(["no", "not", "never"])
+
+_polarity_table = None
+_token_pattern = None
+
+
+def _sentiment_token_pattern():
+    """Regex splitting text the way TextBlob's ``find_tokens`` does (cached)"""
+    global _token_pattern
+    if _token_pattern is None:
+        from textblob._text import ABBREVIATIONS, PUNCTUATION
+
+        # Quotes are always split off, other marks only at the ends of a word
+        inner = re.escape(PUNCTUATION.replace("'", "").replace('"', ""))
+        separator = "\\s'\"\u2018\u2019\u201c\u201d" + inner
+        word = "[^" + separator + "]"
+        abbreviations = "|".join(re.escape(a) for a in sorted(ABBREVIATIONS, key=len, reverse=True)
+                                 if a.endswith("."))
+        _token_pattern = re.compile(
+            # Abbreviations keep their period: "e.g.", "U.S.", "Mr.", "etc."
+            "(?:(?:[A-Za-z]\\.)+|[A-Z][bcdfghjklmnpqrstvwxz|]+\\.|" + abbreviations + ")"
+            "(?=[" + separator + "]|$)"
+            # Words, with punctuation only inside them ("well-known", "3.5")
+            "|" + word + "+(?:[" + inner + "]+" + word + "+)*"
+            "|\\.{3,}|\\S")
+    return _token_pattern
+
+
+def sentiment_tokens(text: str) -> List[str]:
+    """Lowercase tokens as TextBlob's sentiment analyzer sees them
+
+    Mirrors ``textblob._text.find_tokens``: "n't" is split off its verb,
+    apostrophes and quotes are tokens of their own, punctuation at either
+    end of a word is split into one token per mark, and abbreviations and
+    ellipses stay whole.
+    """
+    return [token.lower() for token in
+            _sentiment_token_pattern().findall(text.replace("n't", " n't"))]
+
+
+def load_polarity_table():
+    """Precompute TextBlob's word polarities as NumPy arrays (cached)
+
+    Returns ``(index, polarity, intensity, is_modifier)`` where ``index``
+    maps a word to its row in the three arrays.
+    """
+    global _polarity_table
+    if _polarity_table is None:
+        from textblob.en import sentiment
+
+        sentiment.load()
+        words = [w for w in sentiment if None in sentiment[w]]
+        values = np.array([sentiment[w][None] for w in words], dtype=np.float32).reshape(-1, 3)
+        modifier = np.array([any(pos in sentiment.modifiers for pos in sentiment[w] if pos)
+                             for w in words], dtype=bool)
+        index = {w: i for i, w in enumerate(words)}
+        _polarity_table = (index, values[:, 0].copy(), values[:, 2].copy(), modifier)
+    return _polarity_table
+
+
+def _textblob_polarities(texts: List[str]) -> List[float]:
+    from textblob import TextBlob
+    return [TextBlob(text).sentiment.polarity for text in texts]
+
+
+def textblob_polarity_many(texts: Sequence[str], processes: Optional[int] = None,
+                           chunk_size: int = 2000) -> np.ndarray:
+    """Exact TextBlob polarity for many texts, spread over a process pool"""
+    from multiprocessing import Pool
+
+    chunks = [list(texts[i:i + chunk_size]) for i in range(0, len(texts), chunk_size)]
+    with Pool(processes) as pool:
+        results = pool.map(_textblob_polarities, chunks)
+    return np.fromiter(chain.from_iterable(results), dtype=np.float32, count=len(texts))
+
+
+def _last_before(flags: np.ndarray) -> np.ndarray:
+    """For each position, the index of the last flagged position before it (-1 if none)"""
+    positions = np.where(flags, np.arange(len(flags)), -1)
+    last = np.empty(len(flags), dtype=np.int64)
+    last[0] = -1
+    last[1:] = np.maximum.accumulate(positions)[:-1]
+    return last
+
+
+def polarity_many(token_lists: Sequence[List[str]]) -> np.ndarray:
+    """Vectorised TextBlob polarity for texts tokenised with ``sentiment_tokens``
+
+    Follows the pattern analyzer's rules: the polarity is the mean over
+    assessments of known words; a modifier ("very") followed by a known
+    word, across words of up to two letters, is merged with it into one
+    assessment scaled by the modifier's intensity; a negation before a
+    known word, across one-letter tokens ("not a good"), flips and halves
+    its assessment ("not good" = -0.5 * good) and inverts the intensity it
+    passes on, unless it follows an "-ly" modifier ("really not good"),
+    which it negates instead; and each "!" after an assessment scales it by
+    1.25. Emoticons and "(!)" are not scored.
+    """
+    index, table_polarity, table_intensity, table_modifier = load_polarity_table()
+
+    n_texts = len(token_lists)
+    lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=n_texts)
+    flat = list(chain.from_iterable(token_lists))
+    n_tokens = len(flat)
+    if n_tokens == 0:
+        return np.zeros(n_texts, dtype=np.float32)
+
+    def flags(test):
+        return np.fromiter((test(w) for w in flat), dtype=bool, count=n_tokens)
+
+    text_ids = np.repeat(np.arange(n_texts), lengths)
+    ids = np.fromiter((index.get(w, -1) for w in flat), dtype=np.int64, count=n_tokens)
+    known = ids >= 0
+    negation = ~known & flags(SENTIMENT_NEGATIONS.__contains__)
+    short = ~known & flags(lambda w: len(w) <= 2)
+    tiny = ~known & flags(lambda w: len(w.strip("'")) <= 1)
+    exclamation = flags("!".__eq__)
+
+    safe_ids = np.where(known, ids, 0)
+    polarity = table_polarity[safe_ids].astype(np.float64)
+    intensity = table_intensity[safe_ids].astype(np.float64)
+    modifier = known & table_modifier[safe_ids]
+    ly_modifier = modifier & flags(lambda w: w.endswith("ly"))
+
+    def previous(stops):
+        """Last stop before each token in the same text, and whether there is one"""
+        before = _last_before(stops)
+        valid = before >= 0
+        valid[valid] = text_ids[before[valid]] == text_ids[valid]
+        return before, valid
+
+    # A negation right after an "-ly" modifier (across short words) negates
+    # the modifier's assessment and leaves the modifier pending
+    before, valid = previous(~(short | negation))
+    consumed = negation & valid
+    consumed[consumed] &= ly_modifier[before[consumed]]
+
+    # Modifier pending at each token: it survives short words and the
+    # negations it consumed
+    before_modifier, valid = previous(~(short | consumed))
+    merged = known & valid
+    merged[merged] &= modifier[before_modifier[merged]]
+
+    # Negation pending at each known word: it survives one-letter tokens
+    before, valid = previous(~tiny)
+    negated = known & valid
+    negated[negated] &= negation[before[negated]] & ~consumed[before[negated]]
+
+    # Merged words are scaled by the intensity of the word before them
+    passed_on = np.where(negated, 1.0 / intensity, intensity)
+    merged_at = np.nonzero(merged)[0]
+    polarity[merged_at] = np.clip(polarity[merged_at] * passed_on[before_modifier[merged_at]],
+                                  -1.0, 1.0)
+
+    # Assessments are runs of merged known words, scored by their last word
+    known_at = np.nonzero(known)[0]
+    group = np.cumsum(~merged[known_at]) - 1
+    n_groups = int(group[-1]) + 1 if len(group) else 0
+    group_of = np.full(n_tokens, -1, dtype=np.int64)
+    group_of[known_at] = group
+    last = np.zeros(n_groups, dtype=np.int64)
+    last[group] = known_at
+    score = polarity[last]
+    group_negated = np.bincount(group, weights=negated[known_at], minlength=n_groups) > 0
+    group_negated[group_of[before_modifier[consumed]]] = True
+
+    # "!" boosts the latest assessment, unless a later word merges into it
+    before, valid = previous(known)
+    boosts = np.nonzero(exclamation & valid)[0]
+    if len(boosts):
+        targets = group_of[before[boosts]]
+        targets = targets[last[targets] == before[boosts]]
+        score = np.clip(score * 1.25 ** np.bincount(targets, minlength=n_groups), -1.0, 1.0)
+
+    score = np.where(group_negated, score * -0.5, score)
+    owners = text_ids[last]
+    sums = np.bincount(owners, weights=score, minlength=n_texts)
+    counts = np.bincount(owners, minlength=n_texts)
+    return (sums / np.maximum(counts, 1)).astype(np.float32)
+
+
+class TextMoodAnalyzer:
+    """Keyword lexicon first, sentiment polarity as fallback
+
+    ``labels`` are the (positive, negative, neutral) moods returned by the
+    polarity fallback, so each app can keep its own label spelling. Text
+    whose keyword matches are all negated gets the neutral label.
+    """
+
+    def __init__(self, lexicon: MoodLexicon,
+                 labels: Tuple[str, str, str] = ("happy", "sad", "neutral"),
+                 keyword_confidence: float = 0.8, neutral_confidence: float = 0.5,
+                 positive_threshold: float = POSITIVE_THRESHOLD,
+                 negative_threshold: float = NEGATIVE_THRESHOLD):
+        self.lexicon = lexicon
+        self.positive, self.negative, self.neutral = labels
+        self.keyword_confidence = keyword_confidence
+        self.neutral_confidence = neutral_confidence
+        self.positive_threshold = positive_threshold
+        self.negative_threshold = negative_threshold
+
+    def analyze(self, text: str) -> Tuple[str, float]:
+        """Mood and confidence for one transcript (exact TextBlob fallback)"""
+        feeling = self.lexicon.match(text, negated=self.neutral)
+        if feeling:
+            return feeling, self.keyword_confidence
+
+        from textblob import TextBlob
+        return self._from_polarity(TextBlob(text).sentiment.polarity)
+
+    def analyze_many(self, texts: Iterable[str], exact: bool = False,
+                     processes: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Moods and confidences for many transcripts as two arrays
+
+        Keyword matches are looked up per text and the remaining texts are
+        scored with the vectorised polarity table (same results as TextBlob
+        for text without emoticons), or with real TextBlob in a process pool
+        when ``exact`` is set.
+        """
+        texts = list(texts)
+
+        labels = np.empty(len(texts), dtype=object)
+        confidences = np.empty(len(texts), dtype=np.float32)
+
+        pending = []
+        for i, text in enumerate(texts):
+            feeling = self.lexicon.match(text, negated=self.neutral)
+            if feeling:
+                labels[i] = feeling
+                confidences[i] = self.keyword_confidence
+            else:
+                pending.append(i)
+
+        if pending:
+            if exact:
+                polarity = textblob_polarity_many([texts[i] for i in pending], processes)
+            else:
+                polarity = polarity_many([sentiment_tokens(texts[i]) for i in pending])
+            positive = polarity > self.positive_threshold
+            negative = polarity < self.negative_threshold
+            labels[pending] = np.where(positive, self.positive,
+                                       np.where(negative, self.negative, self.neutral))
+            confidences[pending] = np.where(positive | negative, np.abs(polarity),
+                                            self.neutral_confidence)
+
+        return labels, confidences
+
+    def _from_polarity(self, polarity: float) -> Tuple[str, float]:
+        if polarity > self.positive_threshold:
+            return self.positive, abs(polarity)
+        elif polarity < self.negative_threshold:
+            return self.negative, abs(polarity)
+        return self.neutral, self.neutral_confidence
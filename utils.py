@@ -1,8 +1,9 @@
 """Utility functions for mood detection system"""
 
+import threading
 import cv2
 import numpy as np
-from typing import Tuple, Optional
+from typing import List, Tuple, Optional
 
 def check_camera_available(camera_index: int = 0) -> bool:
     """Check if camera is available"""
@@ -12,21 +13,80 @@ def check_camera_available(camera_index: int = 0) -> bool:
         return True
     return False
 
-def enhance_frame(frame: np.ndarray) -> np.ndarray:
-    """Enhance frame quality for better detection"""
-    # Convert to LAB color space
-    lab = cv2.cvtColor(frame, cv2.COLOR_BGR2LAB)
-    l, a, b = cv2.split(lab)
+class FrameEnhancer:
+    """CLAHE contrast enhancement with cached, per-thread OpenCV objects
+    
+    The CLAHE object and the LAB scratch buffer are created lazily, once
+    per thread, because CLAHE instances must not be shared between threads.
+    """
+    
+    def __init__(self, clip_limit: float = 3.0, tile_grid_size: Tuple[int, int] = (8, 8)):
+        self.clip_limit = clip_limit
+        self.tile_grid_size = tile_grid_size
+        self._local = threading.local()
+    
+    def _clahe(self):
+        clahe = getattr(self._local, 'clahe', None)
+        if clahe is None:
+            clahe = cv2.createCLAHE(clipLimit=self.clip_limit, tileGridSize=self.tile_grid_size)
+            self._local.clahe = clahe
+        return clahe
+    
+    def enhance(self, frame: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Enhance a BGR frame, writing into ``out`` when it is given"""
+        # Convert to LAB color space, reusing this thread's buffer
+        lab = getattr(self._local, 'lab', None)
+        if lab is None or lab.shape != frame.shape:
+            lab = np.empty_like(frame)
+            self._local.lab = lab
+        cv2.cvtColor(frame, cv2.COLOR_BGR2LAB, dst=lab)
+        
+        # Apply CLAHE to L channel
+        l = self._clahe().apply(cv2.extractChannel(lab, 0))
+        cv2.insertChannel(l, lab, 0)
+        
+        if out is None:
+            return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+        cv2.cvtColor(lab, cv2.COLOR_LAB2BGR, dst=out)
+        return out
+
+class FaceRegionDetector:
+    """Haar cascade face detector that parses the cascade XML once per thread"""
+    
+    def __init__(self, cascade_file: Optional[str] = None,
+                 scale_factor: float = 1.3, min_neighbors: int = 5):
+        self.cascade_file = cascade_file or (
+            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+        )
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self._local = threading.local()
     
-    # Apply CLAHE to L channel
-    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-    l = clahe.apply(l)
+    def _cascade(self):
+        cascade = getattr(self._local, 'cascade', None)
+        if cascade is None:
+            cascade = cv2.CascadeClassifier(self.cascade_file)
+            self._local.cascade = cascade
+        return cascade
     
-    # Merge channels
-    enhanced = cv2.merge([l, a, b])
-    enhanced = cv2.cvtColor(enhanced, cv2.COLOR_LAB2BGR)
+    def detect_all(self, frame: np.ndarray) -> List[Tuple[int, int, int, int]]:
+        """Return all face regions as (x, y, w, h)"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        faces = self._cascade().detectMultiScale(gray, self.scale_factor, self.min_neighbors)
+        return [tuple(int(v) for v in face) for face in faces]
     
-    return enhanced
+    def detect(self, frame: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        """Return the first face region (x, y, w, h), or None"""
+        faces = self.detect_all(frame)
+        return faces[0] if faces else None
+
+# Shared default instances used by the helper functions below
+_enhancer = FrameEnhancer()
+_face_detector = FaceRegionDetector()
+
+def enhance_frame(frame: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Enhance frame quality for better detection"""
+    return _enhancer.enhance(frame, out)
 
 def draw_emotion_bar(frame: np.ndarray, emotions: dict, 
                      x: int = 10, y: int = 100) -> np.ndarray:
@@ -68,12 +128,4 @@ def get_lighting_quality(frame: np.ndarray) -> Tuple[str, float]:
 
 def detect_face_region(frame: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
     """Detect face region using Haar Cascade"""
-    face_cascade = cv2.CascadeClassifier(
-        cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-    )
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(gray, 1.3, 5)
-    
-    if len(faces) > 0:
-        return tuple(faces[0])  # Return first face (x, y, w, h)
-    return None
+    return _face_detector.detect(frame)
@@ -0,0 +1,172 @@
+"""Video stabilization and temporal smoothing for the camera stream"""
+
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+class VideoStabilizer:
+    """Reduces camera shake with sparse optical flow and smooths frames over time
+
+    Feature points are tracked from frame to frame and only re-seeded with
+    ``goodFeaturesToTrack`` every ``reseed_interval`` frames or when fewer
+    than ``min_points`` survive. Flow runs on a copy of the gray frame scaled
+    by ``flow_scale``. The camera trajectory and the temporal smoothing both
+    use running sums over preallocated buffers, so per-frame cost does not
+    depend on the smoothing window.
+
+    ``smoothing_mode`` is ``"window"`` (box average of the last
+    ``smoothing_window`` frames) or ``"ema"`` (exponential moving average via
+    ``cv2.accumulateWeighted`` with weight ``ema_alpha``).
+    """
+
+    def __init__(self, smoothing_window=5, reseed_interval=10, min_points=50,
+                 flow_scale=0.5, smoothing_mode="window", ema_alpha=0.4):
+        self.smoothing_window = smoothing_window
+        self.reseed_interval = max(1, reseed_interval)
+        self.min_points = min_points
+        self.flow_scale = flow_scale
+        self.smoothing_mode = smoothing_mode
+        self.ema_alpha = ema_alpha
+
+        self.prev_gray = None
+        self.prev_pts = None
+        self.frames_since_seed = 0
+
+        # Running trajectory over the last smoothing_window translations
+        self._recent = deque()
+        self._sum_dx = 0.0
+        self._sum_dy = 0.0
+
+        # Temporal smoothing buffers, allocated on the first frame
+        self._ring = None
+        self._ring_sum = None
+        self._ring_count = 0
+        self._ring_index = 0
+        self._ema = None
+
+    def reset(self):
+        """Drop all tracking and smoothing state (e.g. after a camera change)"""
+        self.prev_gray = None
+        self.prev_pts = None
+        self.frames_since_seed = 0
+        self._recent.clear()
+        self._sum_dx = self._sum_dy = 0.0
+        self._ring = self._ring_sum = self._ema = None
+        self._ring_count = self._ring_index = 0
+
+    def _flow_gray(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.flow_scale != 1.0:
+            gray = cv2.resize(gray, None, fx=self.flow_scale, fy=self.flow_scale,
+                              interpolation=cv2.INTER_AREA)
+        return gray
+
+    def _seed_points(self, gray):
+        self.frames_since_seed = 0
+        return cv2.goodFeaturesToTrack(gray,
+                                       maxCorners=200,
+                                       qualityLevel=0.01,
+                                       minDistance=max(1, int(30 * self.flow_scale)),
+                                       blockSize=3)
+
+    def _push_translation(self, dx, dy):
+        """Add a translation and return the mean over the smoothing window"""
+        if len(self._recent) == self.smoothing_window:
+            old_dx, old_dy = self._recent.popleft()
+            self._sum_dx -= old_dx
+            self._sum_dy -= old_dy
+        self._recent.append((dx, dy))
+        self._sum_dx += dx
+        self._sum_dy += dy
+        n = len(self._recent)
+        return self._sum_dx / n, self._sum_dy / n
+
+    def stabilize_frame(self, frame):
+        """Apply stabilization to reduce camera shake"""
+        gray = self._flow_gray(frame)
+
+        if self.prev_gray is None or self.prev_gray.shape != gray.shape:
+            self.prev_gray = gray
+            self.prev_pts = self._seed_points(gray)
+            return frame
+
+        # Re-seed features only periodically or when tracking thins out
+        if (self.prev_pts is None or len(self.prev_pts) < self.min_points
+                or self.frames_since_seed >= self.reseed_interval):
+            self.prev_pts = self._seed_points(self.prev_gray)
+
+        prev_pts = self.prev_pts
+        curr_pts = None
+        if prev_pts is not None and len(prev_pts) > 0:
+            # Calculate optical flow
+            curr_pts, status, err = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, prev_pts, None)
+
+            # Filter valid points
+            valid = status.reshape(-1) == 1
+            prev_pts = prev_pts[valid]
+            curr_pts = curr_pts[valid]
+
+            if len(prev_pts) >= 3:
+                # Estimate transformation
+                transform = cv2.estimateAffinePartial2D(prev_pts, curr_pts)[0]
+
+                if transform is not None:
+                    # Extract translation in full-resolution pixels
+                    dx = transform[0, 2] / self.flow_scale
+                    dy = transform[1, 2] / self.flow_scale
+
+                    smooth_dx, smooth_dy = self._push_translation(dx, dy)
+
+                    # Calculate smoothed trajectory
+                    if len(self._recent) >= self.smoothing_window:
+                        # Apply smoothed transformation
+                        M = np.array([[1, 0, smooth_dx - dx],
+                                      [0, 1, smooth_dy - dy]], dtype=np.float32)
+
+                        h, w = frame.shape[:2]
+                        frame = cv2.warpAffine(frame, M, (w, h))
+
+        self.prev_gray = gray
+        self.prev_pts = curr_pts.reshape(-1, 1, 2) if curr_pts is not None else None
+        self.frames_since_seed += 1
+        return frame
+
+    def smooth_frame(self, frame):
+        """Apply temporal smoothing"""
+        if self.smoothing_mode == "ema":
+            return self._smooth_ema(frame)
+        return self._smooth_window(frame)
+
+    def _smooth_window(self, frame):
+        if self._ring is None or self._ring.shape[1:] != frame.shape:
+            self._ring = np.empty((self.smoothing_window,) + frame.shape, dtype=np.uint8)
+            # uint16 holds up to 257 frames of 8-bit data without overflow
+            self._ring_sum = np.zeros(frame.shape, dtype=np.uint16)
+            self._ring_count = 0
+            self._ring_index = 0
+
+        slot = self._ring[self._ring_index]
+        if self._ring_count == self.smoothing_window:
+            np.subtract(self._ring_sum, slot, out=self._ring_sum)
+        else:
+            self._ring_count += 1
+        np.copyto(slot, frame)
+        np.add(self._ring_sum, slot, out=self._ring_sum)
+        self._ring_index = (self._ring_index + 1) % self.smoothing_window
+
+        if self._ring_count < self.smoothing_window:
+            return frame
+
+        # Average frames for smoothing (fresh array: downstream stages keep it)
+        smoothed = np.empty(frame.shape, dtype=np.uint8)
+        np.floor_divide(self._ring_sum, self.smoothing_window, out=smoothed, casting='unsafe')
+        return smoothed
+
+    def _smooth_ema(self, frame):
+        if self._ema is None or self._ema.shape != frame.shape:
+            self._ema = frame.astype(np.float32)
+            return frame
+        cv2.accumulateWeighted(frame, self._ema, self.ema_alpha)
+        return cv2.convertScaleAbs(self._ema)
@@ -0,0 +1,45 @@
+"""Feelings lexicon and mood analysis for the web app's voice transcripts
+
+Kept apart from ``web_mood_app`` so the analysis can be imported (e.g. by
+``benchmark.py``) without starting the app's camera, logger and threads.
+"""
+
+from lexicon import MoodLexicon
+from text_mood import TextMoodAnalyzer
+
+# Feelings dataset for keyword matching
+feelings_data = {
+    "keyword": [
+        "angry", "hate", "irritated", "mad", "furious",
+        "sad", "depressed", "cry", "unhappy", "miserable",
+        "happy", "joy", "excited", "love", "great", "wonderful",
+        "bored", "tired", "exhausted",
+        "anxious", "worried", "nervous", "stressed",
+        "fed up", "feeling down", "over the moon", "burned out", "freaked out"
+    ],
+    "feeling": [
+        "angry", "angry", "angry", "angry", "angry",
+        "sad", "sad", "sad", "sad", "sad",
+        "happy", "happy", "happy", "happy", "happy", "happy",
+        "neutral", "neutral", "neutral",
+        "fear", "fear", "fear", "fear",
+        "angry", "sad", "happy", "neutral", "fear"
+    ]
+}
+lexicon = MoodLexicon.from_columns(feelings_data)
+text_analyzer = TextMoodAnalyzer(lexicon)
+
+
+def match_feeling(text):
+    """Match feeling from text using the keyword lexicon"""
+    return lexicon.match(text)
+
+
+def analyze_voice_mood(text):
+    """Analyze mood from voice text using keywords, then sentiment analysis"""
+    return text_analyzer.analyze(text)
+
+
+def analyze_many(texts, exact=False):
+    """Analyze many transcripts at once, returning (moods, confidences) arrays"""
+    return text_analyzer.analyze_many(texts, exact=exact)
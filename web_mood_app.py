@@ -2,121 +2,112 @@
 
 from flask import Flask, render_template, Response, jsonify, request
 import cv2
-from fer import FER
+import os
 import random
 import json
 from datetime import datetime
-import speech_recognition as sr
-from textblob import TextBlob
-import pandas as pd
 import threading
-import numpy as np
-from collections import deque
+import atexit
+import time
+import uuid
+from config import (CAMERA_INDEX, INFERENCE_WORKERS, PIPELINE_QUEUE_SIZE,
+                    PIPELINE_DROP_OLDEST, STREAM_SUBSCRIBER_QUEUE_SIZE,
+                    FACE_TRACKING_ENABLED, FACE_DETECT_INTERVAL, FACE_TRACK_MIN_RATIO,
+                    STABILIZER_SMOOTHING_WINDOW, STABILIZER_RESEED_INTERVAL,
+                    STABILIZER_MIN_POINTS, STABILIZER_FLOW_SCALE,
+                    STABILIZER_SMOOTHING_MODE, INFERENCE_WIDTH, EMOTION_BACKEND,
+                    MODEL_WARMUP, ENABLE_MOOD_HISTORY, HISTORY_FILE,
+                    SEGMENT_SWITCH_FRAMES, SEGMENT_MAX_SECONDS, SEGMENT_GAP_SECONDS,
+                    EMOTION_PUSH_MAX_RATE, EMOTION_PUSH_KEEPALIVE,
+                    ADAPTIVE_SCHEDULING, LATENCY_BUDGET_MS, ADAPTIVE_WIDTHS,
+                    ADAPTIVE_MAX_STRIDE, MAX_INFERENCE_RATE, EMOTION_SMOOTHING,
+                    EMOTION_SMOOTHING_TIME_CONSTANT, EMOTION_SMOOTHING_WINDOW,
+                    EMOTION_SWITCH_MARGIN, EMOTION_SWITCH_FRAMES,
+                    ENABLE_PIPELINE_METRICS, STREAM_JPEG_QUALITY, STREAM_MAX_WIDTH,
+                    STREAM_ENCODER, STREAM_SKIP_UNCHANGED, STREAM_OVERLAY)
+from frame_pipeline import FrameHub, FramePipeline
+from stream_encoder import BOUNDARY, StreamEncoder, part_header
+from face_tracker import FaceTracker
+from emotion_backends import get_backend
+from emotion_classifier import EMOTION_LABELS
+from adaptive_scheduler import AdaptiveScheduler
+from emotion_smoothing import FaceSmoother
+from pipeline_metrics import PipelineMetrics
+from video_stabilizer import VideoStabilizer
+from model_loader import FAILED, ModelLoader
+from mood_logger import MoodLogger, MoodLogWriter
+from mood_segments import MoodSegmenter
+from state_store import EmotionState, FrameOverlay, StateStore
+from voice_mood import analyze_many, analyze_voice_mood, match_feeling  # noqa: F401
 
 app = Flask(__name__)
 
-# Initialize FER detector
-detector = FER(mtcnn=True)
+def load_detector():
+    """Build the emotion detector, classifying all faces of a frame in one batch"""
+    detector = get_backend(EMOTION_BACKEND, inference_width=INFERENCE_WIDTH)
+    if MODEL_WARMUP:
+        detector.warm_up()
+    if FACE_TRACKING_ENABLED:
+        detector = FaceTracker(detector, detect_interval=FACE_DETECT_INTERVAL,
+                               min_track_ratio=FACE_TRACK_MIN_RATIO)
+    return detector
 
-# Video stabilization settings
-class VideoStabilizer:
-    def __init__(self, smoothing_window=5):
-        self.smoothing_window = smoothing_window
-        self.frame_buffer = deque(maxlen=smoothing_window)
-        self.prev_gray = None
-        self.transforms = deque(maxlen=30)
-        
-    def stabilize_frame(self, frame):
-        """Apply stabilization to reduce camera shake"""
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        if self.prev_gray is None:
-            self.prev_gray = gray
-            return frame
-        
-        # Detect feature points
-        prev_pts = cv2.goodFeaturesToTrack(self.prev_gray, 
-                                           maxCorners=200,
-                                           qualityLevel=0.01,
-                                           minDistance=30,
-                                           blockSize=3)
-        
-        if prev_pts is not None:
-            # Calculate optical flow
-            curr_pts, status, err = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, prev_pts, None)
-            
-            # Filter valid points
-            idx = np.where(status == 1)[0]
-            prev_pts = prev_pts[idx]
-            curr_pts = curr_pts[idx]
-            
-            if len(prev_pts) > 0:
-                # Estimate transformation
-                transform = cv2.estimateAffinePartial2D(prev_pts, curr_pts)[0]
-                
-                if transform is not None:
-                    # Extract translation
-                    dx = transform[0, 2]
-                    dy = transform[1, 2]
-                    
-                    # Store transform
-                    self.transforms.append([dx, dy])
-                    
-                    # Calculate smoothed trajectory
-                    if len(self.transforms) >= self.smoothing_window:
-                        smooth_dx = np.mean([t[0] for t in list(self.transforms)[-self.smoothing_window:]])
-                        smooth_dy = np.mean([t[1] for t in list(self.transforms)[-self.smoothing_window:]])
-                        
-                        # Apply smoothed transformation
-                        diff_dx = smooth_dx - dx
-                        diff_dy = smooth_dy - dy
-                        
-                        # Create transformation matrix
-                        M = np.array([[1, 0, diff_dx],
-                                     [0, 1, diff_dy]], dtype=np.float32)
-                        
-                        # Apply transformation
-                        h, w = frame.shape[:2]
-                        frame = cv2.warpAffine(frame, M, (w, h))
-        
-        self.prev_gray = gray
-        return frame
-    
-    def smooth_frame(self, frame):
-        """Apply temporal smoothing"""
-        self.frame_buffer.append(frame.copy())
-        
-        if len(self.frame_buffer) < self.smoothing_window:
-            return frame
-        
-        # Average frames for smoothing
-        smoothed = np.mean(self.frame_buffer, axis=0).astype(np.uint8)
-        return smoothed
+# The emotion models (TensorFlow) load in the background so the server can
+# start streaming right away; frames go out without analysis until ready
+detector_loader = ModelLoader(load_detector, name="emotion-detector")
 
 # Initialize stabilizer
-stabilizer = VideoStabilizer(smoothing_window=5)
-
-# Initialize speech recognizer
-recognizer = sr.Recognizer()
-
-# Feelings dataset for keyword matching
-feelings_data = {
-    "keyword": [
-        "angry", "hate", "irritated", "mad", "furious",
-        "sad", "depressed", "cry", "unhappy", "miserable",
-        "happy", "joy", "excited", "love", "great", "wonderful",
-        "bored", "tired", "exhausted",
-        "anxious", "worried", "nervous", "stressed"
-    ],
-    "feeling": [
-        "angry", "angry", "angry", "angry", "angry",
-        "sad", "sad", "sad", "sad", "sad",
-        "happy", "happy", "happy", "happy", "happy", "happy",
-        "neutral", "neutral", "neutral",
-        "fear", "fear", "fear", "fear"
-    ]
-}
-dataset = pd.DataFrame(feelings_data)
+stabilizer = VideoStabilizer(smoothing_window=STABILIZER_SMOOTHING_WINDOW,
+                             reseed_interval=STABILIZER_RESEED_INTERVAL,
+                             min_points=STABILIZER_MIN_POINTS,
+                             flow_scale=STABILIZER_FLOW_SCALE,
+                             smoothing_mode=STABILIZER_SMOOTHING_MODE)
+
+# Detections are queued from the frame loop and written by one background
+# thread; the file lock lets enhanced_main.py share the same history file
+mood_log = MoodLogWriter(MoodLogger(HISTORY_FILE)) if ENABLE_MOOD_HISTORY else None
+
+# Frames are collapsed into mood segments so history gets one entry per
+# stretch of the same mood instead of one per analyzed frame
+segmenter = MoodSegmenter(switch_frames=SEGMENT_SWITCH_FRAMES,
+                          max_seconds=SEGMENT_MAX_SECONDS,
+                          gap_seconds=SEGMENT_GAP_SECONDS)
+
+def log_segments(segments):
+    """Queue closed mood segments for the history file"""
+    if mood_log:
+        for segment in segments:
+            mood_log.submit_segment(segment, method="facial")
+
+if mood_log:
+    # Registered after the writer, so it runs first at exit
+    atexit.register(lambda: log_segments(segmenter.flush()))
+
+# Trades inference stride, resolution and stabilization to stay within the
+# latency budget; frames keep their full resolution in the stream
+scheduler = AdaptiveScheduler(latency_budget=LATENCY_BUDGET_MS / 1000.0,
+                              widths=ADAPTIVE_WIDTHS,
+                              max_stride=ADAPTIVE_MAX_STRIDE,
+                              workers=INFERENCE_WORKERS,
+                              max_inference_rate=MAX_INFERENCE_RATE) if ADAPTIVE_SCHEDULING else None
+stabilizer_paused = False
+
+# Per-face temporal smoothing, so the label doesn't flicker between frames
+face_smoother = FaceSmoother(mode=EMOTION_SMOOTHING,
+                             time_constant=EMOTION_SMOOTHING_TIME_CONSTANT,
+                             window=EMOTION_SMOOTHING_WINDOW,
+                             switch_margin=EMOTION_SWITCH_MARGIN,
+                             switch_frames=EMOTION_SWITCH_FRAMES) if EMOTION_SMOOTHING else None
+
+# Per-stage histograms, frame counters and drops, served on /metrics
+metrics = PipelineMetrics() if ENABLE_PIPELINE_METRICS else None
+
+# JPEG encoder for /video_feed (libjpeg-turbo when PyTurboJPEG is installed)
+stream_encoder = StreamEncoder(quality=STREAM_JPEG_QUALITY, max_width=STREAM_MAX_WIDTH,
+                               backend=STREAM_ENCODER)
+
+# Speech recognizer, created on first use
+recognizer = None
 
 # Motivational messages
 motivations = {
@@ -153,171 +144,366 @@ motivations = {
     ]
 }
 
-# Global variables
-current_emotion = "neutral"
-current_confidence = 0.0
-current_message = "Welcome! Look at the camera to detect your mood."
-voice_emotion = None
-voice_text = ""
-voice_confidence = 0.0
-is_listening = False
+# Emotion state shared by the pipeline, the voice thread and request handlers:
+# an immutable snapshot swapped atomically, with a version for ETags and push
+state = StateStore(EmotionState())
 
-def generate_frames():
-    """Generate video frames with emotion detection"""
-    global current_emotion, current_confidence, current_message
-    
-    camera = cv2.VideoCapture(0)
+# Versions restart at 0 with every process, so ETags also name the process
+# to keep a client's ETag from an earlier run from matching a new state
+BOOT_ID = uuid.uuid4().hex[:16]
+
+# Faces of the latest analyzed frame, pushed on /overlay_stream
+overlay = StateStore(FrameOverlay())
+
+def open_camera():
+    """Open the camera with settings tuned for low-latency streaming"""
+    camera = cv2.VideoCapture(CAMERA_INDEX)
     
     # Set camera properties for better stability
     camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
     camera.set(cv2.CAP_PROP_FPS, 30)
     
-    while True:
-        success, frame = camera.read()
-        if not success:
-            break
-        
-        # Apply video stabilization
-        frame = stabilizer.stabilize_frame(frame)
-        frame = stabilizer.smooth_frame(frame)
+    # Motion history from a previous session doesn't apply to the new one
+    stabilizer.reset()
+    return camera
+
+def stabilize(frame):
+    """Apply video stabilization and temporal smoothing"""
+    global stabilizer_paused
+    if scheduler and not scheduler.stabilize:
+        stabilizer_paused = True
+        return frame
+    if stabilizer_paused:
+        # Motion history from before the pause no longer applies
+        stabilizer.reset()
+        stabilizer_paused = False
+    if metrics is None:
+        return stabilizer.smooth_frame(stabilizer.stabilize_frame(frame))
+    started = time.time()
+    frame = stabilizer.stabilize_frame(frame)
+    stabilized = time.time()
+    frame = stabilizer.smooth_frame(frame)
+    metrics.stage("stabilize", stabilized - started)
+    metrics.stage("smooth", time.time() - stabilized)
+    return frame
+
+def analyze_frame(frame):
+    """Detect emotions on a frame and update the current emotion state"""
+    detector = detector_loader.get(timeout=0)
+    if detector is None:
+        # Models are still loading; stream the frame without analysis
+        return None
+    
+    # Detection runs at the scheduler's width; faces are classified from the full frame
+    result = detector.detect_emotions(
+        frame, inference_width=scheduler.inference_width if scheduler else None)
+    if face_smoother:
+        result = face_smoother.update(result)
+    
+    faces = []
+    for face in result:
+        emotions = face['emotions']
+        emotion = face.get('emotion') or max(emotions, key=emotions.get)
+        faces.append({
+            'box': [int(v) for v in face['box']],
+            'emotion': emotion,
+            'confidence': emotions[emotion],
+            'emotions': emotions
+        })
+    changes = {'faces': tuple(faces), 'models_ready': True}
+    
+    if faces:
+        # The first face drives the headline emotion and message
+        detected_emotion = faces[0]['emotion']
+        confidence = faces[0]['confidence']
+        changes.update(emotion=detected_emotion, confidence=confidence)
         
-        # Detect emotions
-        result = detector.detect_emotions(frame)
+        if confidence > 0.3:
+            changes['message'] = random.choice(motivations.get(detected_emotion, ["Stay positive!"]))
         
-        if result:
-            emotions = result[0]['emotions']
-            detected_emotion = max(emotions, key=emotions.get)
-            confidence = emotions[detected_emotion]
-            
-            # Update global state
-            current_emotion = detected_emotion
-            current_confidence = confidence
-            
-            if confidence > 0.3:
-                current_message = random.choice(motivations.get(detected_emotion, ["Stay positive!"]))
-            
-            # Draw on frame
-            x, y, w, h = result[0]['box']
-            cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-            
-            # Display emotion and confidence
-            text = f"{detected_emotion}: {confidence:.2f}"
-            cv2.putText(frame, text, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 
-                       0.9, (0, 255, 0), 2)
-            
-            # Draw emotion bars
-            y_offset = 30
-            for emotion, score in sorted(emotions.items(), key=lambda x: x[1], reverse=True)[:3]:
-                bar_width = int(score * 200)
-                cv2.rectangle(frame, (10, y_offset), (10 + bar_width, y_offset + 20), 
-                            (0, 255, 0), -1)
-                cv2.putText(frame, f"{emotion}: {score:.2f}", (10, y_offset + 15), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-                y_offset += 30
+        log_segments(segmenter.update(detected_emotion, confidence))
+    else:
+        log_segments(segmenter.expire())
+    
+    # One atomic swap, so readers never see a half-updated state
+    state.update(**changes)
+    return result
+
+def draw_emotions(frame, result):
+    """Draw face boxes, emotion labels and top-3 emotion bars on a frame"""
+    for face in result:
+        emotions = face['emotions']
+        detected_emotion = face.get('emotion') or max(emotions, key=emotions.get)
+        confidence = emotions[detected_emotion]
         
-        # Encode frame
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame = buffer.tobytes()
+        # Draw on frame
+        x, y, w, h = face['box']
+        cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
         
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+        # Display emotion and confidence
+        text = f"{detected_emotion}: {confidence:.2f}"
+        cv2.putText(frame, text, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 
+                   0.9, (0, 255, 0), 2)
+    
+    # Draw emotion bars for the primary face
+    emotions = result[0]['emotions']
+    y_offset = 30
+    for emotion, score in sorted(emotions.items(), key=lambda x: x[1], reverse=True)[:3]:
+        bar_width = int(score * 200)
+        cv2.rectangle(frame, (10, y_offset), (10 + bar_width, y_offset + 20), 
+                    (0, 255, 0), -1)
+        cv2.putText(frame, f"{emotion}: {score:.2f}", (10, y_offset + 15), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        y_offset += 30
+    
+    return frame
+
+def publish_overlay(frame, result):
+    """Publish an inference result as compact metadata keyed by its frame id"""
+    if result is None:
+        return
+    height, width = frame.image.shape[:2]
+    faces = []
+    for face in result:
+        emotions = face['emotions']
+        faces.append({
+            'box': [int(v) for v in face['box']],
+            'emotion': face.get('emotion') or max(emotions, key=emotions.get),
+            'scores': [round(float(emotions.get(label, 0.0)), 3) for label in EMOTION_LABELS]
+        })
+    overlay.update(frame_id=frame.frame_id, width=width, height=height, faces=tuple(faces))
+
+def create_pipeline():
+    """Build the capture / inference / encoding pipeline for the camera
+    
+    Capture, inference and encoding run as separate pipeline stages so the
+    stream keeps camera rate while the overlay shows the latest inference.
+    With ``STREAM_OVERLAY = "client"`` frames are streamed clean and the
+    browser draws the overlay from /overlay_stream.
+    """
+    annotate = draw_emotions if STREAM_OVERLAY == "server" else None
+    return FramePipeline(open_camera, analyze_frame, annotate,
+                         preprocess=stabilize,
+                         encode=stream_encoder.encode,
+                         inference_workers=INFERENCE_WORKERS,
+                         queue_size=PIPELINE_QUEUE_SIZE,
+                         drop_oldest=PIPELINE_DROP_OLDEST,
+                         scheduler=scheduler,
+                         metrics=metrics,
+                         skip_unchanged=STREAM_SKIP_UNCHANGED,
+                         on_result=publish_overlay)
+
+# One camera and inference loop shared by every /video_feed client
+frame_hub = FrameHub(create_pipeline, subscriber_queue_size=STREAM_SUBSCRIBER_QUEUE_SIZE,
+                     metrics=metrics)
+
+def generate_frames():
+    """Generate video frames with emotion detection
+    
+    Header and JPEG go out as separate chunks, so the shared encoded frame is
+    never copied into a per-client buffer. Each part names its frame id and
+    the frame id of the inference result it goes with.
+    """
+    for encoded in frame_hub.frames():
+        yield part_header(len(encoded.payload),
+                          headers={'X-Frame-Id': encoded.frame_id,
+                                   'X-Result-Id': encoded.result_id})
+        yield encoded.payload
 
 @app.route('/')
 def index():
     """Render the main page"""
-    return render_template('index.html')
+    return render_template('index.html', overlay_mode=STREAM_OVERLAY)
 
 @app.route('/video_feed')
 def video_feed():
     """Video streaming route"""
     return Response(generate_frames(),
-                    mimetype='multipart/x-mixed-replace; boundary=frame')
-
-def match_feeling(text):
-    """Match feeling from text using keyword dataset"""
-    words = text.lower().split()
-    for word in words:
-        match = dataset[dataset['keyword'] == word]
-        if not match.empty:
-            return match.iloc[0]['feeling']
-    return None
-
-def analyze_voice_mood(text):
-    """Analyze mood from voice text using sentiment analysis"""
-    feeling = match_feeling(text)
-    if feeling:
-        return feeling, 0.8
+                    mimetype=f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+
+def current_snapshot():
+    """Current ``(version, EmotionState)``, noting when the models became ready or failed"""
+    version, snapshot = state.snapshot()
+    if not snapshot.models_ready and not snapshot.models_error:
+        if detector_loader.ready:
+            state.update(models_ready=True)
+        elif detector_loader.state == FAILED:
+            state.update(models_error=detector_loader.status()['error'])
+        else:
+            return version, snapshot
+        version, snapshot = state.snapshot()
+    return version, snapshot
+
+def emotion_payload(snapshot):
+    """Face + voice emotion state as a JSON-ready dict"""
+    # Combine face and voice emotions
+    combined_emotion = snapshot.emotion
+    combined_confidence = snapshot.confidence
     
-    # Use TextBlob for sentiment analysis
-    blob = TextBlob(text)
-    polarity = blob.sentiment.polarity
+    if snapshot.voice_emotion and snapshot.voice_confidence > 0.5:
+        # If voice detection is strong, blend it with face detection
+        combined_emotion = snapshot.voice_emotion
+        combined_confidence = (snapshot.confidence + snapshot.voice_confidence) / 2
     
-    if polarity > 0.3:
-        return "happy", abs(polarity)
-    elif polarity < -0.3:
-        return "sad", abs(polarity)
-    else:
-        return "neutral", 0.5
+    return {
+        'emotion': combined_emotion,
+        'confidence': round(combined_confidence, 2),
+        'message': snapshot.message,
+        'voice_text': snapshot.voice_text,
+        'voice_emotion': snapshot.voice_emotion,
+        'is_listening': snapshot.is_listening,
+        'faces': list(snapshot.faces),
+        'models_ready': snapshot.models_ready,
+        'models_error': snapshot.models_error
+    }
 
 @app.route('/get_emotion')
 def get_emotion():
-    """API endpoint to get current emotion data"""
-    # Combine face and voice emotions
-    combined_emotion = current_emotion
-    combined_confidence = current_confidence
+    """API endpoint to get current emotion data
     
-    if voice_emotion and voice_confidence > 0.5:
-        # If voice detection is strong, blend it with face detection
-        combined_emotion = voice_emotion
-        combined_confidence = (current_confidence + voice_confidence) / 2
+    The ETag is the boot id and state version; a request with a matching
+    If-None-Match header gets 304 Not Modified.
+    """
+    version, snapshot = current_snapshot()
+    payload = emotion_payload(snapshot)
+    payload['version'] = version
+    payload['timestamp'] = datetime.now().isoformat()
+    response = jsonify(payload)
+    response.set_etag(f"{BOOT_ID}-{version}")
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+def emotion_events():
+    """Yield Server-Sent Events carrying the emotion state whenever it changes
+    
+    Bursts of changes are coalesced to at most ``EMOTION_PUSH_MAX_RATE``
+    events per second; a comment line is sent after ``EMOTION_PUSH_KEEPALIVE``
+    idle seconds so proxies keep the connection open.
+    """
+    min_interval = 1.0 / EMOTION_PUSH_MAX_RATE
+    sent_version = -1
+    next_send = 0.0
+    while True:
+        version, _ = state.wait(sent_version, EMOTION_PUSH_KEEPALIVE)
+        if version == sent_version:
+            current_snapshot()  # Pick up the models becoming ready
+            if state.version == sent_version:
+                yield ": keepalive\n\n"
+            continue
+        
+        delay = next_send - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        
+        # Send the newest state, coalescing changes made while waiting
+        sent_version, snapshot = current_snapshot()
+        next_send = time.monotonic() + min_interval
+        payload = emotion_payload(snapshot)
+        payload['version'] = sent_version
+        payload['timestamp'] = datetime.now().isoformat()
+        yield f"id: {sent_version}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route('/emotion_stream')
+def emotion_stream():
+    """Server-Sent Events stream of emotion updates (replaces polling /get_emotion)"""
+    return Response(emotion_events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def overlay_events():
+    """Yield Server-Sent Events with the faces of each newly analyzed frame
     
+    The first event (``event: labels``) lists the emotion labels in the
+    order of every face's ``scores``.
+    """
+    yield f"event: labels\ndata: {json.dumps(EMOTION_LABELS)}\n\n"
+    sent_version = -1
+    while True:
+        version, snapshot = overlay.wait(sent_version, EMOTION_PUSH_KEEPALIVE)
+        if version == sent_version:
+            yield ": keepalive\n\n"
+            continue
+        sent_version = version
+        if snapshot.frame_id < 0:
+            continue
+        payload = {
+            'frame_id': snapshot.frame_id,
+            'width': snapshot.width,
+            'height': snapshot.height,
+            'faces': list(snapshot.faces)
+        }
+        yield f"id: {snapshot.frame_id}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n"
+
+@app.route('/overlay_stream')
+def overlay_stream():
+    """Server-Sent Events stream of per-frame face boxes and score vectors"""
+    return Response(overlay_events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/status')
+def status():
+    """API endpoint reporting whether the emotion models are loaded"""
+    pipeline = frame_hub.pipeline
     return jsonify({
-        'emotion': combined_emotion,
-        'confidence': round(combined_confidence, 2),
-        'message': current_message,
-        'voice_text': voice_text,
-        'voice_emotion': voice_emotion,
-        'is_listening': is_listening,
-        'timestamp': datetime.now().isoformat()
+        'ready': detector_loader.ready,
+        'models': detector_loader.status(),
+        'stream_clients': frame_hub.subscriber_count,
+        'inference_errors': pipeline.inference_errors if pipeline else 0,
+        'last_inference_error': pipeline.last_inference_error if pipeline else None,
+        'scheduler': scheduler.status() if scheduler else None
     })
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Pipeline metrics in Prometheus text format (``?format=json`` for a summary)"""
+    if metrics is None:
+        return jsonify({'error': 'Pipeline metrics are disabled'}), 404
+    if request.args.get('format') == 'json':
+        return jsonify(metrics.summary())
+    return Response(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/start_listening', methods=['POST'])
 def start_listening():
     """Start voice recognition"""
-    global is_listening, voice_emotion, voice_text, voice_confidence, current_message
-    
-    is_listening = True
+    state.update(is_listening=True)
     
     def listen():
-        global is_listening, voice_emotion, voice_text, voice_confidence, current_message
+        global recognizer
         
         try:
+            import speech_recognition as sr
+            if recognizer is None:
+                recognizer = sr.Recognizer()
+            
             with sr.Microphone() as source:
                 recognizer.adjust_for_ambient_noise(source, duration=0.5)
                 audio = recognizer.listen(source, timeout=5, phrase_time_limit=10)
                 
                 # Recognize speech
                 text = recognizer.recognize_google(audio)
-                voice_text = text
                 
                 # Analyze mood from text
                 emotion, confidence = analyze_voice_mood(text)
-                voice_emotion = emotion
-                voice_confidence = confidence
                 
-                # Update message
-                current_message = random.choice(motivations.get(emotion, ["Stay positive!"]))
+                if mood_log:
+                    mood_log.submit(emotion, confidence, method="voice", notes=text)
                 
+                # Update voice result and message together
+                state.update(voice_text=text, voice_emotion=emotion, voice_confidence=confidence,
+                             message=random.choice(motivations.get(emotion, ["Stay positive!"])))
+                
+        except ImportError as e:
+            # Checked first: ``sr`` is unbound when the import itself failed
+            state.update(voice_text=f"Speech recognition is unavailable: {str(e)}")
         except sr.WaitTimeoutError:
-            voice_text = "No speech detected. Please try again."
+            state.update(voice_text="No speech detected. Please try again.")
         except sr.UnknownValueError:
-            voice_text = "Could not understand audio. Please speak clearly."
+            state.update(voice_text="Could not understand audio. Please speak clearly.")
         except sr.RequestError as e:
-            voice_text = f"Speech recognition error: {str(e)}"
+            state.update(voice_text=f"Speech recognition error: {str(e)}")
         except Exception as e:
-            voice_text = f"Error: {str(e)}"
+            state.update(voice_text=f"Error: {str(e)}")
         finally:
-            is_listening = False
+            state.update(is_listening=False)
     
     # Run listening in a separate thread
     thread = threading.Thread(target=listen)
@@ -329,8 +515,7 @@ def start_listening():
 @app.route('/stop_listening', methods=['POST'])
 def stop_listening():
     """Stop voice recognition"""
-    global is_listening
-    is_listening = False
+    state.update(is_listening=False)
     return jsonify({'status': 'stopped', 'message': 'Voice recognition stopped'})
 
 if __name__ == '__main__':
@@ -341,4 +526,9 @@ if __name__ == '__main__':
     print("   http://localhost:5000")
     print("\n💡 The camera will start automatically")
     print("   Press Ctrl+C to stop the server\n")
-    app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
+    
+    debug = True
+    # With the debug reloader only the child process serves requests
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        detector_loader.start()
+    app.run(debug=debug, host='0.0.0.0', port=5000, threaded=True)